@@ -0,0 +1,234 @@
+"""
+Admission control: a concurrency limit and a bounded wait queue per route group.
+
+Each group (auth, catalog, checkout, admin, other) has its own gate, so a login storm
+can only saturate the auth gate: cart and checkout requests keep their own slots and
+never queue behind bcrypt. A request that finds its group's queue full is rejected at
+once with 503 + Retry-After instead of adding to the backlog.
+
+Queue timeouts adapt, CoDel-style. While the queue keeps draining, a waiter may wait up
+to ADMISSION_QUEUE_TIMEOUT_MS for a slot. Once the queue has stayed non-empty for longer
+than ADMISSION_OVERLOAD_INTERVAL_MS (a standing queue, i.e. sustained overload), new
+waiters only get ADMISSION_OVERLOAD_TIMEOUT_MS. Excess load is then shed in milliseconds
+instead of every request timing out slowly.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import Counter, Gauge, stats_collector
+
+
+# First matching prefix wins. Paths outside /api and the exempt ones are never gated;
+# /api/pools/stream holds its connection open and is capped by pool_feed.py instead
+ROUTE_GROUPS: List[Tuple[str, str]] = [
+    ("/api/auth/", "auth"),
+    ("/api/cart", "checkout"),
+    ("/api/orders", "checkout"),
+    ("/api/admin/", "admin"),
+    ("/api/catalog/", "catalog"),
+    ("/api/products/", "catalog"),
+    ("/api/search/", "catalog"),
+    ("/api/seller/products/all", "catalog"),
+    ("/api/", "other"),
+]
+EXEMPT_PATHS = {"/api/", "/api/metrics", "/api/pools/stream"}
+
+# group -> (concurrency limit, max queued)
+DEFAULT_LIMITS = {
+    "auth": (16, 32),
+    "catalog": (200, 400),
+    "checkout": (64, 128),
+    "admin": (16, 32),
+    "other": (64, 128),
+}
+
+
+def _env_ms(name: str, default: float) -> float:
+    return float(os.environ.get(name, default)) / 1000
+
+
+class Rejected(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        max_queue: int,
+        queue_timeout: float = 1.0,
+        overload_timeout: float = 0.05,
+        overload_interval: float = 1.0,
+    ):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.overload_timeout = overload_timeout
+        self.overload_interval = overload_interval
+        self.active = 0
+        self._waiters: deque = deque()
+        self._queue_empty_at = time.monotonic()
+        # EWMA of how long admitted requests hold a slot; sizes Retry-After
+        self._service_time = 0.05
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def overloaded(self, now: Optional[float] = None) -> bool:
+        return bool(self._waiters) and (now or time.monotonic()) - self._queue_empty_at > self.overload_interval
+
+    def retry_after(self) -> int:
+        # Rough time for the current backlog to drain through the group's slots
+        return max(1, math.ceil((self.queued + 1) * self._service_time / self.limit))
+
+    def _reject(self) -> Rejected:
+        self.rejected += 1
+        return Rejected(self.retry_after())
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._queue_empty_at = time.monotonic()
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject()
+
+        timeout = self.overload_timeout if self.overloaded() else self.queue_timeout
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise self._reject()
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as the client went away
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            if not self._waiters:
+                self._queue_empty_at = time.monotonic()
+        self.admitted += 1
+
+    def release(self, held_for: Optional[float] = None):
+        if held_for is not None:
+            self._service_time += 0.1 * (held_for - self._service_time)
+        # Hand the slot straight to the oldest live waiter; active stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+        self._queue_empty_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "overloaded": self.overloaded(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "service_time_ewma": round(self._service_time, 6),
+        }
+
+
+def gates_from_env() -> Dict[str, AdmissionGate]:
+    """ADMISSION_<GROUP>_LIMIT / ADMISSION_<GROUP>_QUEUE override DEFAULT_LIMITS per group."""
+    gates = {}
+    for group, (limit, max_queue) in DEFAULT_LIMITS.items():
+        gates[group] = AdmissionGate(
+            group,
+            limit=int(os.environ.get(f"ADMISSION_{group.upper()}_LIMIT", limit)),
+            max_queue=int(os.environ.get(f"ADMISSION_{group.upper()}_QUEUE", max_queue)),
+            queue_timeout=_env_ms("ADMISSION_QUEUE_TIMEOUT_MS", 1000),
+            overload_timeout=_env_ms("ADMISSION_OVERLOAD_TIMEOUT_MS", 50),
+            overload_interval=_env_ms("ADMISSION_OVERLOAD_INTERVAL_MS", 1000),
+        )
+    return gates
+
+
+def route_group(path: str) -> Optional[str]:
+    if path in EXEMPT_PATHS:
+        return None
+    for prefix, group in ROUTE_GROUPS:
+        if path.startswith(prefix):
+            return group
+    return None
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware; a slot is held until the response (including a streamed body) is sent."""
+
+    def __init__(self, app, gates: Dict[str, AdmissionGate]):
+        self.app = app
+        self.gates = gates
+
+    async def __call__(self, scope, receive, send):
+        group = route_group(scope["path"]) if scope["type"] == "http" and scope["method"] != "OPTIONS" else None
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.gates[group]
+        try:
+            await gate.acquire()
+        except Rejected as e:
+            await self._busy(send, group, e.retry_after)
+            return
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(time.monotonic() - started)
+
+    @staticmethod
+    async def _busy(send, group: str, retry_after: int):
+        body = json.dumps({"detail": f"Server is busy ({group}), please retry"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+ADMISSION_METRICS = {
+    "active": Gauge("kivu_admission_active", "Requests being served by route group.", ("group",)),
+    "queued": Gauge("kivu_admission_queued", "Requests waiting for admission by route group.", ("group",)),
+    "admitted": Counter("kivu_admission_admitted_total", "Requests admitted by route group.", ("group",)),
+    "rejected": Counter("kivu_admission_rejected_total", "Requests shed with a 503 by route group.", ("group",)),
+    "timed_out": Counter("kivu_admission_timed_out_total", "Requests that timed out waiting by route group.", ("group",)),
+}
+
+
+def admission_collector(gates: Dict[str, AdmissionGate]) -> Callable[[], List[str]]:
+    """COLLECTORS entry for /api/metrics."""
+    return stats_collector(ADMISSION_METRICS, lambda: (
+        ((group,), {field: getattr(gate, field) for field in ADMISSION_METRICS}) for group, gate in gates.items()
+    ))
@@ -0,0 +1,293 @@
+"""
+Seller sales analytics over daily rollups in the `sales_daily` collection: one document
+per (seller, product, UTC day) with units, revenue and order count, plus the pool share
+of units and revenue (regular = total - pool).
+
+New orders are added incrementally: place_order sends one unordered bulk of $inc
+upserts per order, one per product it contains. Past days are (re)built by backfill().
+It walks each day's orders in batches, sums them in memory and then replaces that day's
+rollups, so running it again repairs a day instead of double counting. The last
+finished day is checkpointed, and an interrupted backfill resumes after it. By default
+the backfill stops at today, which is left to the incremental updates.
+
+Cancelled orders are left out of the rollups. Orders placed before prices were
+recorded (no unit_price) add units but no revenue.
+
+seller_report() reads at most one row per product per day of the window and computes
+totals, trends and percentiles with pandas/numpy.
+
+    python analytics.py --days 90                 # backfill the last 90 full days
+    python analytics.py --since 2025-01-01 --include-today
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+from mongo import mongo_now
+from pricing import load_products
+
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS = "sales_daily"
+CHECKPOINTS = "analytics_backfill"
+METRICS = ["units", "revenue", "pool_units", "pool_revenue", "orders"]
+ROLLUP_PROJECTION = {"_id": 0, "product_id": 1, "day": 1, **{metric: 1 for metric in METRICS}}
+ORDER_PROJECTION = {"_id": 0, "id": 1, "created_at": 1, "order_status": 1, "items": 1}
+SELLER_PROJECTION = {"_id": 0, "id": 1, "seller_id": 1}
+EXCLUDED_STATUSES = ["cancelled"]
+PERCENTILES = [50, 90, 99]
+TREND_WINDOW = 7
+BATCH_SIZE = int(os.environ.get("ANALYTICS_BATCH_SIZE", 1000))
+PAUSE_MS = float(os.environ.get("ANALYTICS_PAUSE_MS", 20))
+
+RollupKey = Tuple[str, str, datetime]
+
+
+def day_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def _rollup_id(key: RollupKey) -> dict:
+    seller_id, product_id, day = key
+    return {"seller_id": seller_id, "product_id": product_id, "day": day}
+
+
+async def _resolve_sellers(db, orders: Iterable[dict], known: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """Seller per product for order lines that predate OrderItem.seller_id; `known` doubles as a cache."""
+    missing = {
+        item["product_id"]
+        for order in orders for item in order["items"]
+        if not item.get("seller_id") and item["product_id"] not in known
+    }
+    if missing:
+        products = await load_products(db, missing, SELLER_PROJECTION)
+        for product_id in missing:
+            known[product_id] = products.get(product_id, {}).get("seller_id")
+    return known
+
+
+def add_order(totals: Dict[RollupKey, Dict[str, float]], order: dict, sellers: Dict[str, Optional[str]]):
+    """Add one order's lines to `totals`, keyed by (seller, product, day)."""
+    day = day_start(order["created_at"])
+    counted = set()
+    for item in order["items"]:
+        seller_id = item.get("seller_id") or sellers.get(item["product_id"])
+        if seller_id is None:
+            continue  # Product deleted before the backfill could attribute it
+        key = (seller_id, item["product_id"], day)
+        row = totals.setdefault(key, dict.fromkeys(METRICS, 0))
+        revenue = (item.get("unit_price") or 0) * item["quantity"]
+        row["units"] += item["quantity"]
+        row["revenue"] += revenue
+        if item.get("is_pool_purchase"):
+            row["pool_units"] += item["quantity"]
+            row["pool_revenue"] += revenue
+        # Pool and regular lines of the same product are one order
+        if key not in counted:
+            row["orders"] += 1
+            counted.add(key)
+
+
+async def record_order_sales(db, order: dict):
+    """Incremental update for a newly created order; failures are left for the backfill to repair."""
+    totals: Dict[RollupKey, Dict[str, float]] = {}
+    try:
+        add_order(totals, order, await _resolve_sellers(db, [order], {}))
+        if totals:
+            await db[ROLLUPS].bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": _rollup_id(key)},
+                        {"$inc": row, "$setOnInsert": _rollup_id(key)},
+                        upsert=True,
+                    )
+                    for key, row in totals.items()
+                ],
+                ordered=False,
+            )
+    except PyMongoError as e:
+        logger.error(f"Sales rollups not updated for order {order['id']}: {e}")
+
+
+async def rebuild_day(db, day: datetime, batch_size: int = BATCH_SIZE, pause_ms: float = PAUSE_MS,
+                      sellers: Optional[Dict[str, Optional[str]]] = None) -> int:
+    """Recompute one day's rollups from its orders and swap them in. Returns the order count."""
+    sellers = {} if sellers is None else sellers
+    totals: Dict[RollupKey, Dict[str, float]] = {}
+    query = {"created_at": {"$gte": day, "$lt": day + timedelta(days=1)}, "order_status": {"$nin": EXCLUDED_STATUSES}}
+    scanned = 0
+    last = None
+    while True:
+        batch_query = query if last is None else {"$and": [query, {"$or": [
+            {"created_at": {"$gt": last[0]}},
+            {"created_at": last[0], "id": {"$gt": last[1]}},
+        ]}]}
+        orders = await db.orders.find(batch_query, ORDER_PROJECTION) \
+            .sort([("created_at", ASCENDING), ("id", ASCENDING)]).limit(batch_size).to_list(length=batch_size)
+        if not orders:
+            break
+        await _resolve_sellers(db, orders, sellers)
+        for order in orders:
+            add_order(totals, order, sellers)
+        scanned += len(orders)
+        last = (orders[-1]["created_at"], orders[-1]["id"])
+        await asyncio.sleep(pause_ms / 1000)
+
+    rebuilt_at = mongo_now()
+    operations = [
+        ReplaceOne({"_id": _rollup_id(key)}, {**_rollup_id(key), **row, "rebuilt_at": rebuilt_at}, upsert=True)
+        for key, row in totals.items()
+    ]
+    for start in range(0, len(operations), batch_size):
+        await db[ROLLUPS].bulk_write(operations[start:start + batch_size], ordered=False)
+    # Rollups for products that no longer have orders that day
+    await db[ROLLUPS].delete_many({"day": day, "rebuilt_at": {"$ne": rebuilt_at}})
+    return scanned
+
+
+async def backfill(db, since: datetime, until: Optional[datetime] = None, resume: bool = True, **options) -> int:
+    """Rebuild every day in [since, until); until defaults to today (exclusive). Returns days rebuilt."""
+    since = day_start(since)
+    until = day_start(until or datetime.utcnow())
+    run_id = f"{since:%Y-%m-%d}..{until:%Y-%m-%d}"
+    day = since
+    if resume:
+        checkpoint = await db[CHECKPOINTS].find_one({"_id": run_id})
+        if checkpoint and checkpoint.get("last_day"):
+            day = checkpoint["last_day"] + timedelta(days=1)
+            logger.info(f"Resuming sales backfill {run_id} at {day:%Y-%m-%d}")
+    sellers: Dict[str, Optional[str]] = {}
+    rebuilt = 0
+    while day < until:
+        started = time.perf_counter()
+        scanned = await rebuild_day(db, day, sellers=sellers, **options)
+        await db[CHECKPOINTS].update_one(
+            {"_id": run_id},
+            {"$set": {"last_day": day, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        logger.info(f"Sales rollups for {day:%Y-%m-%d}: {scanned} orders in {time.perf_counter() - started:.2f}s")
+        rebuilt += 1
+        day += timedelta(days=1)
+    return rebuilt
+
+
+def _percentiles(values: np.ndarray) -> Dict[str, float]:
+    if not len(values):
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def _change(previous: float, recent: float) -> Optional[float]:
+    return round((recent - previous) / previous, 4) if previous else None
+
+
+def build_report(rows: List[dict], start: datetime, days: int, top: int) -> dict:
+    """Shape rollup rows for one seller into totals, a zero-filled daily series and a product breakdown."""
+    index = pd.date_range(start, periods=days, freq="D")
+    frame = pd.DataFrame(rows, columns=["product_id", "day", *METRICS])
+    frame[METRICS] = frame[METRICS].astype(float)
+    daily = frame.groupby("day")[METRICS].sum().reindex(index, fill_value=0.0)
+
+    revenue = daily["revenue"].to_numpy()
+    units = daily["units"].to_numpy()
+    half = days // 2
+    slope = float(np.polyfit(np.arange(days), revenue, 1)[0]) if days > 1 and revenue.any() else 0.0
+    moving = daily["revenue"].rolling(TREND_WINDOW, min_periods=1).mean().to_numpy()
+
+    products = frame.groupby("product_id")[METRICS].sum()
+    total_revenue = revenue.sum()
+    products["revenue_share"] = products["revenue"] / total_revenue if total_revenue else 0.0
+    products["pool_share"] = (products["pool_units"] / products["units"].replace(0, np.nan)).fillna(0.0)
+    products["revenue_percentile"] = products["revenue"].rank(pct=True) * 100
+    products = products.sort_values(["revenue", "units"], ascending=False).head(top)
+
+    totals = daily[METRICS[:-1]].sum()
+    return {
+        "start": index[0].to_pydatetime(),
+        "days": days,
+        "totals": {
+            "units": int(totals["units"]),
+            "revenue": round(float(totals["revenue"]), 2),
+            "pool_units": int(totals["pool_units"]),
+            "pool_revenue": round(float(totals["pool_revenue"]), 2),
+            "regular_units": int(totals["units"] - totals["pool_units"]),
+            "regular_revenue": round(float(totals["revenue"] - totals["pool_revenue"]), 2),
+            "pool_share": round(float(totals["pool_units"] / totals["units"]), 4) if totals["units"] else 0.0,
+        },
+        "trend": {
+            "revenue_per_day_slope": round(slope, 4),
+            # Second half of the window against the first
+            "revenue_change": _change(revenue[:half].sum(), revenue[half:].sum()),
+            "units_change": _change(units[:half].sum(), units[half:].sum()),
+        },
+        "daily_revenue_percentiles": _percentiles(revenue),
+        "product_revenue_percentiles": _percentiles(frame.groupby("product_id")["revenue"].sum().to_numpy()),
+        "daily": [
+            {
+                "day": day.to_pydatetime(),
+                "units": int(row.units),
+                "revenue": round(row.revenue, 2),
+                "pool_units": int(row.pool_units),
+                "pool_revenue": round(row.pool_revenue, 2),
+                "revenue_avg": round(float(avg), 2),
+            }
+            for day, row, avg in zip(index, daily.itertuples(index=False), moving)
+        ],
+        "products": [
+            {
+                "product_id": product_id,
+                "name": None,
+                "units": int(row.units),
+                "revenue": round(row.revenue, 2),
+                "orders": int(row.orders),
+                "pool_share": round(float(row.pool_share), 4),
+                "revenue_share": round(float(row.revenue_share), 4),
+                "revenue_percentile": round(float(row.revenue_percentile), 1),
+            }
+            for product_id, row in zip(products.index, products.itertuples(index=False))
+        ],
+    }
+
+
+async def seller_report(db, seller_id: str, days: int = 30, top: int = 10, until: Optional[datetime] = None) -> dict:
+    """Report over the `days` days ending with `until` (default today, included)."""
+    end = day_start(until or datetime.utcnow()) + timedelta(days=1)
+    start = end - timedelta(days=days)
+    rows = await db[ROLLUPS].find(
+        {"seller_id": seller_id, "day": {"$gte": start, "$lt": end}}, ROLLUP_PROJECTION
+    ).to_list(length=None)
+    report = build_report(rows, start, days, top)
+    products = await load_products(db, (p["product_id"] for p in report["products"]), {"_id": 0, "id": 1, "name": 1})
+    for product in report["products"]:
+        product["name"] = products.get(product["product_id"], {}).get("name")
+    return {"seller_id": seller_id, **report}
+
+
+if __name__ == "__main__":
+    from mongo import run_script
+
+    parser = argparse.ArgumentParser(description="Backfill the sales_daily rollups from orders")
+    parser.add_argument("--days", type=int, default=30, help="full days before today to rebuild")
+    parser.add_argument("--since", type=lambda value: datetime.strptime(value, "%Y-%m-%d"), help="first day (overrides --days)")
+    parser.add_argument("--include-today", action="store_true",
+                        help="also rebuild today; only while orders aren't being recorded incrementally yet")
+    parser.add_argument("--no-resume", action="store_true", help="ignore the checkpoint of an earlier identical run")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--pause-ms", type=float, default=PAUSE_MS)
+    args = parser.parse_args()
+
+    today = day_start(datetime.utcnow())
+    until = today + timedelta(days=1) if args.include_today else today
+    run_script(lambda db: backfill(db, args.since or today - timedelta(days=args.days), until,
+                                   resume=not args.no_resume, batch_size=args.batch_size, pause_ms=args.pause_ms))
@@ -5,6 +5,9 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
+import time
+
+from cache import TTLCache
 
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'kivu-marketplace-secret-key-change-in-production')
 ALGORITHM = 'HS256'
@@ -13,6 +16,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 security = HTTPBearer()
 
+# Decoded tokens, keyed by the raw token string, so repeat requests skip signature verification
+token_cache = TTLCache(maxsize=10000, ttl=300)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -29,25 +35,37 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_user_access_token(user_id: str, account_type: str, token_version: int = 0) -> str:
+    # The role and token version travel in the claims so authorization can be checked without a user lookup
+    return create_access_token(data={"sub": user_id, "account_type": account_type, "ver": token_version})
+
 def decode_token(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Could not validate credentials',
             headers={'WWW-Authenticate': 'Bearer'},
         )
+    # Never keep a token cached past its own expiry
+    remaining = payload.get('exp', 0) - time.time()
+    if remaining > 0:
+        token_cache.set(token, payload, ttl=min(token_cache.ttl, remaining))
+    return payload
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_token(token)
-    user_id: str = payload.get('sub')
-    if user_id is None:
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    payload = decode_token(credentials.credentials)
+    if payload.get('sub') is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Could not validate credentials',
             headers={'WWW-Authenticate': 'Bearer'},
         )
-    return user_id
\ No newline at end of file
+    return payload
+
+async def get_current_user(claims: dict = Depends(get_token_claims)):
+    return claims['sub']
\ No newline at end of file
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List
+
+from models import Cart, CartItem, CartItemDelta
+
+
+logger = logging.getLogger(__name__)
+
+# Carts are only written by mutations, so updated_at is the last time the user touched it
+CART_SWEEP_INTERVAL = float(os.environ.get('CART_SWEEP_INTERVAL', 3600))
+CART_EMPTY_TTL = timedelta(hours=float(os.environ.get('CART_EMPTY_TTL_HOURS', 24)))
+CART_ABANDONED_TTL = timedelta(days=float(os.environ.get('CART_ABANDONED_TTL_DAYS', 30)))
+SWEEP_BATCH_SIZE = 500
+# A cart element rebuilt field by field inside the update pipeline
+ITEM_FIELDS = {field: f"$$item.{field}" for field in CartItem.__fields__}
+
+
+def _item_matches(delta: CartItemDelta) -> dict:
+    return {"$and": [
+        {"$eq": ["$$item.product_id", {"$literal": delta.product_id}]},
+        {"$eq": ["$$item.is_pool_purchase", delta.is_pool_purchase]},
+    ]}
+
+
+def _apply_delta(items, delta: CartItemDelta) -> dict:
+    """Expression for `items` with one delta applied: $inc the matching element, else append it."""
+    matches = _item_matches(delta)
+    incremented = {"$map": {"input": items, "as": "item", "in": {"$cond": [
+        matches,
+        {**ITEM_FIELDS, "quantity": {"$add": ["$$item.quantity", delta.quantity]}},
+        "$$item",
+    ]}}}
+    appended = {"$concatArrays": [items, {"$literal": [delta.dict()]}]} if delta.quantity > 0 else items
+    has_item = {"$gt": [{"$size": {"$filter": {"input": items, "as": "item", "cond": matches}}}, 0]}
+    return {"$cond": [has_item, incremented, appended]}
+
+
+def cart_delta_pipeline(deltas: List[CartItemDelta]) -> List[dict]:
+    """
+    Update pipeline that applies quantity deltas to a user's cart in one statement:
+
+    1. per delta, increment the matching (product_id, is_pool_purchase) element or
+       append a new one when no such element exists yet,
+    2. drop every element whose quantity fell to zero or below.
+
+    Mongo applies a single-document update atomically, so two concurrent calls that
+    both add a new product serialize: the second sees the first one's element and
+    increments it instead of losing its quantity. Used with upsert, the pipeline also
+    fills the insert-only fields of a new cart.
+    """
+    now = datetime.utcnow()
+    empty_cart = Cart(user_id="").dict(exclude={"user_id", "items", "updated_at"})
+    stages = [{"$set": {
+        **{field: {"$ifNull": [f"${field}", {"$literal": value}]} for field, value in empty_cart.items()},
+        "items": {"$ifNull": ["$items", []]},
+    }}]
+    for delta in deltas:
+        stages.append({"$set": {"items": _apply_delta("$items", delta)}})
+    stages.append({"$set": {
+        "items": {"$filter": {"input": "$items", "as": "item", "cond": {"$gt": ["$$item.quantity", 0]}}},
+        "updated_at": now,
+    }})
+    return stages
+
+
+async def apply_cart_deltas(db, user_id: str, deltas: List[CartItemDelta]):
+    await db.carts.update_one({"user_id": user_id}, cart_delta_pipeline(deltas), upsert=True)
+
+
+async def remove_cart_item(db, user_id: str, product_id: str, is_pool_purchase: bool) -> bool:
+    """$pull the matching element; returns False when the user has no cart."""
+    result = await db.carts.update_one(
+        {"user_id": user_id},
+        {
+            "$pull": {"items": {"product_id": product_id, "is_pool_purchase": is_pool_purchase}},
+            "$set": {"updated_at": datetime.utcnow()},
+        }
+    )
+    return result.matched_count > 0
+
+
+async def get_cart_document(db, user_id: str) -> dict:
+    """The user's cart, or a synthesized empty one; reading never creates the document."""
+    cart_doc = await db.carts.find_one({"user_id": user_id}, {"_id": 0})
+    return cart_doc or Cart(user_id=user_id).dict()
+
+
+def stale_cart_query(now: datetime) -> dict:
+    return {
+        "$or": [
+            {"items": {"$size": 0}, "updated_at": {"$lt": now - CART_EMPTY_TTL}},
+            {"updated_at": {"$lt": now - CART_ABANDONED_TTL}},
+        ]
+    }
+
+
+async def sweep_carts(db, batch_size: int = SWEEP_BATCH_SIZE, pause: float = 0.1) -> int:
+    """
+    Delete empty and abandoned carts in batches of ids. The delete re-checks the staleness
+    filter, so a cart touched between the read and the delete survives; a swept cart is
+    simply recreated by the user's next mutation.
+    """
+    deleted = 0
+    while True:
+        query = stale_cart_query(datetime.utcnow())
+        batch = await db.carts.find(query, {"_id": 1}).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+        result = await db.carts.delete_many({"$and": [{"_id": {"$in": [doc["_id"] for doc in batch]}}, query]})
+        deleted += result.deleted_count
+        if len(batch) < batch_size:
+            break
+        await asyncio.sleep(pause)
+    return deleted
+
+
+async def run_cart_sweeper(db, interval: float = CART_SWEEP_INTERVAL):
+    """Background loop started with the app; a failed sweep is logged and retried next interval."""
+    while True:
+        try:
+            deleted = await sweep_carts(db)
+            if deleted:
+                logger.info(f"Cart sweeper removed {deleted} stale carts")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Cart sweep failed: {e}")
+        await asyncio.sleep(interval)
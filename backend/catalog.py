@@ -0,0 +1,135 @@
+import asyncio
+import re
+from typing import Optional, List, Dict, Any
+
+
+# Price bands shown in the Products.js sidebar, keyed by the same ids the frontend uses.
+# Bounds are on poolPrice: lower is inclusive, upper is inclusive only for '50to100'
+# to match the original client-side filter.
+PRICE_BANDS = {
+    "under50": {"$lt": 50},
+    "50to100": {"$gte": 50, "$lte": 100},
+    "over100": {"$gt": 100},
+}
+
+SORT_KEYS = {
+    "newest": [("created_at", -1), ("id", -1)],
+    "price_asc": [("poolPrice", 1), ("id", 1)],
+    "price_desc": [("poolPrice", -1), ("id", -1)],
+    "rating": [("rating", -1), ("id", -1)],
+    "popular": [("poolCurrent", -1), ("id", -1)],
+}
+
+
+def price_band_expression() -> dict:
+    """Aggregation expression mapping a document's poolPrice onto a PRICE_BANDS key."""
+    return {
+        "$switch": {
+            "branches": [
+                {"case": {"$lt": ["$poolPrice", 50]}, "then": "under50"},
+                {"case": {"$lte": ["$poolPrice", 100]}, "then": "50to100"},
+            ],
+            "default": "over100",
+        }
+    }
+
+
+def price_band(pool_price: float) -> str:
+    """Python twin of price_band_expression(), for code that sees one product at a time."""
+    if pool_price < 50:
+        return "under50"
+    if pool_price <= 100:
+        return "50to100"
+    return "over100"
+
+
+def build_catalog_filters(
+    category: Optional[str] = None,
+    price_band: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    search: Optional[str] = None,
+):
+    """
+    Split the catalog filters into the part shared by every facet and the
+    per-dimension parts, so each facet can be counted without its own filter.
+    """
+    base: Dict[str, Any] = {"status": "approved"}
+    if min_rating is not None:
+        base["rating"] = {"$gte": min_rating}
+    if search:
+        pattern = {"$regex": re.escape(search.strip()), "$options": "i"}
+        base["$or"] = [{"name": pattern}, {"nameRw": pattern}]
+
+    category_filter: Dict[str, Any] = {}
+    if category and category != "all":
+        category_filter["category"] = category
+
+    price: Dict[str, Any] = {}
+    if price_band and price_band != "all":
+        price.update(PRICE_BANDS[price_band])
+    if min_price is not None:
+        price["$gte"] = max(min_price, price.get("$gte", min_price))
+    if max_price is not None:
+        price["$lte"] = min(max_price, price.get("$lte", max_price))
+    price_filter = {"poolPrice": price} if price else {}
+
+    return base, category_filter, price_filter
+
+
+# Fields the facet counts read. The status_category_price_id index holds all of them, so
+# the counting aggregations are answered from the index without loading documents.
+FACET_FIELDS = {"_id": 0, "status": 1, "category": 1, "poolPrice": 1}
+
+
+def category_facet_pipeline(match: dict) -> List[dict]:
+    return [
+        {"$match": match},
+        {"$project": FACET_FIELDS},
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def price_band_facet_pipeline(match: dict) -> List[dict]:
+    return [
+        {"$match": match},
+        {"$project": FACET_FIELDS},
+        {"$group": {"_id": price_band_expression(), "count": {"$sum": 1}}},
+    ]
+
+
+async def fetch_catalog_page(
+    collection,
+    base: dict,
+    category_filter: dict,
+    price_filter: dict,
+    sort: str = "newest",
+    skip: int = 0,
+    limit: int = 20,
+    projection: Optional[dict] = None,
+) -> dict:
+    """
+    The page, the total and the category / price-band counts for one catalog request.
+    Every filter is part of each query's own $match, so all four run on an index: the
+    page as a find() sorted on one of the status_* indexes, the total and the facets over
+    status_category_price_id. Each facet leaves out its own dimension's filter.
+    """
+    limit = max(limit, 1)
+    selected = {**base, **category_filter, **price_filter}
+    items, total, categories, bands = await asyncio.gather(
+        collection.find(selected, projection or {"_id": 0}).sort(SORT_KEYS[sort]).skip(skip).limit(limit).to_list(length=limit),
+        collection.count_documents(selected),
+        collection.aggregate(category_facet_pipeline({**base, **price_filter})).to_list(length=None),
+        collection.aggregate(price_band_facet_pipeline({**base, **category_filter})).to_list(length=None),
+    )
+    band_counts = {row["_id"]: row["count"] for row in bands}
+    return {
+        "items": items,
+        "total": total,
+        "facets": {
+            "categories": [{"value": row["_id"], "count": row["count"]} for row in categories],
+            "price_bands": [{"value": band, "count": band_counts.get(band, 0)} for band in PRICE_BANDS],
+        },
+    }
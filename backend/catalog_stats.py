@@ -0,0 +1,225 @@
+"""
+Materialized catalog statistics in the `catalog_stats` collection: one document per
+(status, category) holding the product count, the count per price band and the
+min/max poolPrice.
+
+Writes keep it current incrementally: creation and imports add products to their
+buckets, and moderation (single or bulk by ids) moves them from the old status's bucket
+to the new one. Changes are grouped per bucket into plain $inc updates. A minimum or
+maximum that leaves with a product is re-read from the status_category_price_id index,
+which takes one index probe per bound. Only writes whose previous state is unknown
+(bulk moderation by filter) and failed incremental updates schedule a full rebuild.
+
+    python catalog_stats.py      # full rebuild
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+from pymongo.errors import PyMongoError
+
+from catalog import PRICE_BANDS, price_band, price_band_expression
+from mongo import mongo_now
+
+
+logger = logging.getLogger(__name__)
+
+STATS = "catalog_stats"
+STATUSES = ("approved", "pending", "rejected")
+
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+def _bucket(status: str, category: str) -> dict:
+    return {"_id": {"status": status, "category": category}}
+
+
+async def _refresh_bounds(db, status: str, category: str):
+    query = {"status": status, "category": category}
+    cheapest = await db.seller_products.find_one(query, {"_id": 0, "poolPrice": 1}, sort=[("poolPrice", ASCENDING)])
+    priciest = await db.seller_products.find_one(query, {"_id": 0, "poolPrice": 1}, sort=[("poolPrice", DESCENDING)])
+    if cheapest is None:
+        await db[STATS].delete_one({**_bucket(status, category), "count": {"$lte": 0}})
+        return
+    await db[STATS].update_one(
+        _bucket(status, category),
+        {"$set": {"min_price": cheapest["poolPrice"], "max_price": priciest["poolPrice"]}},
+    )
+
+
+class StatsDelta:
+    """
+    Count changes for any number of products, grouped per (status, category) bucket so
+    they are applied with one $inc per bucket. Bounds are widened with $min/$max, and
+    re-read only when a removed price was the bucket's minimum or maximum.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], dict] = {}
+
+    def __bool__(self):
+        return bool(self._buckets)
+
+    def _change(self, status: str, category: str) -> dict:
+        return self._buckets.setdefault((status, category), {"count": 0, "bands": {}, "added": [], "removed": []})
+
+    def add(self, product: dict, status: str):
+        change = self._change(status, product["category"])
+        band = price_band(product["poolPrice"])
+        change["count"] += 1
+        change["bands"][band] = change["bands"].get(band, 0) + 1
+        change["added"].append(product["poolPrice"])
+
+    def remove(self, product: dict, status: str):
+        change = self._change(status, product["category"])
+        band = price_band(product["poolPrice"])
+        change["count"] -= 1
+        change["bands"][band] = change["bands"].get(band, 0) - 1
+        change["removed"].append(product["poolPrice"])
+
+    async def apply(self, db):
+        now = datetime.utcnow()
+        for (status, category), change in self._buckets.items():
+            update = {
+                "$inc": {"count": change["count"], **{f"bands.{band}": n for band, n in change["bands"].items() if n}},
+                "$set": {"status": status, "category": category, "updated_at": now},
+            }
+            if change["added"]:
+                update["$min"] = {"min_price": min(change["added"])}
+                update["$max"] = {"max_price": max(change["added"])}
+            if not change["removed"]:
+                await db[STATS].update_one(_bucket(status, category), update, upsert=True)
+                continue
+            bucket = await db[STATS].find_one_and_update(_bucket(status, category), update, upsert=True)
+            removed_min, removed_max = min(change["removed"]), max(change["removed"])
+            if bucket is None or removed_min <= bucket.get("min_price", removed_min) \
+                    or removed_max >= bucket.get("max_price", removed_max):
+                await _refresh_bounds(db, status, category)
+
+
+async def _apply(db, delta: StatsDelta, what: str):
+    try:
+        await delta.apply(db)
+    except PyMongoError as e:
+        logger.error(f"Catalog stats not updated for {what}: {e}")
+        schedule_rebuild(db)
+
+
+async def record_products_added(db, products: Iterable[dict]):
+    delta = StatsDelta()
+    for product in products:
+        delta.add(product, product["status"])
+    if delta:
+        await _apply(db, delta, "new products")
+
+
+async def record_product_added(db, product: dict):
+    await record_products_added(db, [product])
+
+
+async def record_status_changes(db, previous: Iterable[dict], new_status: str):
+    """`previous` holds each product as it was before the status write (status, category, poolPrice)."""
+    delta = StatsDelta()
+    for product in previous:
+        if product.get("status") != new_status:
+            delta.remove(product, product.get("status"))
+            delta.add(product, new_status)
+    if delta:
+        await _apply(db, delta, f"status change to {new_status}")
+
+
+async def record_status_change(db, previous: dict, new_status: str):
+    """`previous` is the product as it was before the status write (find_one_and_update BEFORE)."""
+    await record_status_changes(db, [previous], new_status)
+
+
+async def rebuild_catalog_stats(db) -> int:
+    """Recompute every bucket with one $group and swap the results in. Returns the bucket count."""
+    pipeline = [
+        {"$group": {
+            "_id": {"status": "$status", "category": "$category", "band": price_band_expression()},
+            "count": {"$sum": 1},
+            "min_price": {"$min": "$poolPrice"},
+            "max_price": {"$max": "$poolPrice"},
+        }},
+    ]
+    buckets = {}
+    async for row in db.seller_products.aggregate(pipeline):
+        key = (row["_id"]["status"], row["_id"]["category"])
+        bucket = buckets.setdefault(key, {"count": 0, "bands": {}, "min_price": row["min_price"], "max_price": row["max_price"]})
+        bucket["count"] += row["count"]
+        bucket["bands"][row["_id"]["band"]] = row["count"]
+        bucket["min_price"] = min(bucket["min_price"], row["min_price"])
+        bucket["max_price"] = max(bucket["max_price"], row["max_price"])
+
+    now = mongo_now()
+    operations = [
+        ReplaceOne(
+            _bucket(status, category),
+            {"status": status, "category": category, **bucket, "updated_at": now},
+            upsert=True,
+        )
+        for (status, category), bucket in buckets.items()
+    ]
+    if operations:
+        await db[STATS].bulk_write(operations, ordered=False)
+    # Buckets that no longer have any product
+    await db[STATS].delete_many({"updated_at": {"$lt": now}})
+    logger.info(f"Catalog stats rebuilt: {len(buckets)} buckets")
+    return len(buckets)
+
+
+async def ensure_catalog_stats(db):
+    """Build the stats once on a database that predates them; incremental updates need a base."""
+    if await db[STATS].find_one({}, {"_id": 1}) is None:
+        schedule_rebuild(db)
+
+
+def schedule_rebuild(db):
+    """Run a rebuild in the background, coalescing requests that arrive while one is pending."""
+    global _rebuild_task
+    if _rebuild_task is not None and not _rebuild_task.done():
+        return
+
+    async def rebuild():
+        try:
+            await rebuild_catalog_stats(db)
+        except PyMongoError as e:
+            logger.error(f"Catalog stats rebuild failed: {e}")
+
+    _rebuild_task = asyncio.create_task(rebuild())
+
+
+async def read_catalog_stats(db) -> dict:
+    """Shape the stored buckets for GET /api/catalog/stats: facets over approved products, counts per status."""
+    statuses = {status: 0 for status in STATUSES}
+    bands = {band: 0 for band in PRICE_BANDS}
+    categories = []
+    async for bucket in db[STATS].find({}, {"_id": 0}).sort([("status", ASCENDING), ("category", ASCENDING)]):
+        statuses[bucket["status"]] = statuses.get(bucket["status"], 0) + bucket["count"]
+        if bucket["status"] != "approved" or bucket["count"] <= 0:
+            continue
+        for band, count in bucket.get("bands", {}).items():
+            bands[band] = bands.get(band, 0) + count
+        categories.append({
+            "value": bucket["category"],
+            "count": bucket["count"],
+            "min_price": bucket.get("min_price"),
+            "max_price": bucket.get("max_price"),
+        })
+    return {
+        "total": sum(category["count"] for category in categories),
+        "min_price": min((c["min_price"] for c in categories if c["min_price"] is not None), default=None),
+        "max_price": max((c["max_price"] for c in categories if c["max_price"] is not None), default=None),
+        "categories": categories,
+        "price_bands": [{"value": band, "count": count} for band, count in bands.items()],
+        "statuses": [{"value": status, "count": count} for status, count in statuses.items()],
+    }
+
+
+if __name__ == "__main__":
+    from mongo import run_script
+
+    run_script(rebuild_catalog_stats)
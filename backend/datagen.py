@@ -0,0 +1,322 @@
+"""
+Deterministic synthetic data for the collections server.py reads: users, seller_products,
+carts and orders. Every record is built through its model in models.py.
+
+Each record is derived from (seed, kind, index) alone: its id, its random draws and the
+ids it references. Any slice of the dataset can therefore be regenerated on its own
+(an order can re-derive the prices of the products it contains), and the same seed
+always gives the same data, whatever the batch size or number of writers.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple
+
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError
+
+from models import Cart, CartItem, Order, OrderItem, SellerProduct, User
+
+
+logger = logging.getLogger(__name__)
+
+# category -> (weight, median regular price, [(english noun, kinyarwanda noun)])
+CATEGORIES = {
+    "Electronics": (30, 120.0, [
+        ("Headphones", "Amatwi"), ("Smart Watch", "Isaha Yubwenge"), ("Phone", "Telefoni"),
+        ("Speaker", "Indangururamajwi"), ("Charger", "Icyuma Gishyira Umuriro"), ("Radio", "Radiyo"),
+        ("Laptop", "Mudasobwa"), ("Camera", "Kamera"),
+    ]),
+    "Fashion": (25, 45.0, [
+        ("Dress", "Ikanzu"), ("Shirt", "Ishati"), ("Bag", "Igikapu"), ("Jacket", "Ikoti"),
+        ("Sandals", "Inkweto"), ("Hat", "Ingofero"), ("Scarf", "Igitambaro"),
+    ]),
+    "Home & Garden": (20, 60.0, [
+        ("Coffee Maker", "Icyuma cyo Gukora Ikawa"), ("Lamp", "Itara"), ("Chair", "Intebe"),
+        ("Cooking Pot", "Inkono"), ("Blanket", "Ikiringiti"), ("Water Filter", "Akayunguruzo k'Amazi"),
+        ("Garden Hoe", "Isuka"),
+    ]),
+    "Sports": (15, 55.0, [
+        ("Running Shoes", "Inkweto zo Kwiruka"), ("Football", "Umupira w'Amaguru"), ("Yoga Mat", "Tapi ya Yoga"),
+        ("Bicycle Helmet", "Ingofero y'Igare"), ("Water Bottle", "Icupa ry'Amazi"),
+    ]),
+    "Beauty": (10, 25.0, [
+        ("Shea Butter", "Amavuta ya Shea"), ("Soap", "Isabune"), ("Perfume", "Parfe"), ("Hair Oil", "Amavuta yo mu Musatsi"),
+    ]),
+}
+ADJECTIVES = [
+    ("Premium", "Meza Cyane"), ("Classic", "Isanzwe"), ("Compact", "Ntoya"), ("Durable", "Ikomeye"),
+    ("Wireless", "Idafite Insinga"), ("Handmade", "Ikozwe n'Intoki"), ("Eco", "Itangiza Ibidukikije"),
+    ("Deluxe", "Ihebuje"), ("Travel", "y'Urugendo"), ("Family", "y'Umuryango"),
+]
+FIRST_NAMES = ["Aline", "Jean", "Claudine", "Eric", "Diane", "Patrick", "Grace", "Olivier", "Sandrine", "Emmanuel",
+               "Divine", "Innocent", "Josiane", "Fabrice", "Chantal", "Yves"]
+LAST_NAMES = ["Uwase", "Habimana", "Mukamana", "Niyonzima", "Ingabire", "Mugisha", "Uwimana", "Nshimiyimana",
+              "Iradukunda", "Hakizimana", "Umutoni", "Bizimana"]
+
+PRODUCT_STATUSES = [("approved", 85), ("pending", 10), ("rejected", 5)]
+ORDER_STATUSES = [("delivered", 55), ("shipped", 20), ("processing", 20), ("cancelled", 5)]
+POOL_SIZES = [10, 20, 50, 100, 200]
+
+EMAIL_DOMAIN = "kivu.market"
+DEMO_SELLER_EMAIL = "seller@kivu.market"  # Seller 0, kept from the original demo seed
+
+
+class DatasetSpec(BaseModel):
+    seed: int = 42
+    buyers: int = 50
+    sellers: int = 5
+    admins: int = 0
+    products: int = 200
+    carts: int = 20
+    orders: int = 100
+    # Records are spread over [start, start + days); fixed so timestamps are reproducible too
+    start: datetime = datetime(2025, 1, 1)
+    days: int = 365
+    # Larger = more of the traffic (carts, orders) concentrated on fewer products and sellers
+    popularity_skew: float = 3.0
+
+
+def _digest(*parts) -> bytes:
+    return hashlib.blake2b(":".join(str(part) for part in parts).encode(), digest_size=16).digest()
+
+
+def _weighted(rng: random.Random, choices: List[Tuple[str, int]]) -> str:
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _coprime_stride(count: int) -> int:
+    # Any stride coprime with count turns index -> (index * stride) % count into a permutation
+    stride = max(1, int(count * 0.618033988749895)) | 1
+    while math.gcd(stride, count) != 1:
+        stride += 2
+    return stride
+
+
+class DatasetGenerator:
+    def __init__(self, spec: DatasetSpec, password_hash: str):
+        self.spec = spec
+        self.password_hash = password_hash
+        self._category_names = list(CATEGORIES)
+        self._category_weights = [CATEGORIES[name][0] for name in self._category_names]
+        self._product_stride = _coprime_stride(max(spec.products, 1))
+        self._seller_stride = _coprime_stride(max(spec.sellers, 1))
+        self._buyer_stride = _coprime_stride(max(spec.buyers, 1))
+        # Popular products are re-derived for every cart/order line; their prices and sellers are cached
+        self.product_pricing = lru_cache(maxsize=100_000)(self._product_pricing)
+
+    # --- ids and randomness ---
+
+    def rng(self, kind: str, index: int) -> random.Random:
+        return random.Random(_digest(self.spec.seed, kind, index))
+
+    def record_id(self, kind: str, index: int) -> str:
+        return str(uuid.UUID(bytes=_digest(self.spec.seed, "id", kind, index), version=4))
+
+    def user_id(self, account_type: str, index: int) -> str:
+        return self.record_id(account_type, index)
+
+    def product_id(self, index: int) -> str:
+        return self.record_id("product", index)
+
+    def _timestamp(self, rng: random.Random) -> datetime:
+        return self.spec.start + timedelta(seconds=rng.uniform(0, self.spec.days * 86400))
+
+    def _popular(self, rng: random.Random, count: int, stride: int) -> int:
+        # Power-law rank, scattered over the index range so popularity doesn't follow creation order
+        rank = min(int(count * rng.random() ** self.spec.popularity_skew), count - 1)
+        return (rank * stride) % count
+
+    def popular_product(self, rng: random.Random) -> int:
+        return self._popular(rng, self.spec.products, self._product_stride)
+
+    # --- records ---
+
+    def user(self, account_type: str, index: int) -> dict:
+        rng = self.rng(account_type, index)
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        email = f"{account_type}{index}@{EMAIL_DOMAIN}"
+        if account_type == "seller" and index == 0:
+            name, email = "Kivu Demo Seller", DEMO_SELLER_EMAIL
+        return User(
+            id=self.user_id(account_type, index),
+            email=email,
+            name=name,
+            password_hash=self.password_hash,
+            account_type=account_type,
+            created_at=self._timestamp(rng),
+        ).dict()
+
+    def _product_pricing(self, index: int) -> Tuple[str, float, float, float, int]:
+        """
+        (category, regularPrice, perItemPrice, poolPrice, seller index), drawn from a stream
+        of their own so orders can price and attribute a product's lines without generating
+        the whole product.
+        """
+        rng = self.rng("product-pricing", index)
+        category = rng.choices(self._category_names, self._category_weights)[0]
+        regular = max(round(CATEGORIES[category][1] * rng.lognormvariate(0, 0.6), 2), 1.0)
+        per_item = round(regular * rng.uniform(0.9, 1.0), 2)
+        pool = round(regular * rng.uniform(0.6, 0.85), 2)
+        seller = self._popular(rng, self.spec.sellers, self._seller_stride)
+        return category, regular, per_item, pool, seller
+
+    def product(self, index: int) -> dict:
+        rng = self.rng("product", index)
+        category, regular, per_item, pool, seller = self.product_pricing(index)
+        noun_en, noun_rw = rng.choice(CATEGORIES[category][2])
+        adjective_en, adjective_rw = rng.choice(ADJECTIVES)
+        model = rng.randint(100, 999)
+        pool_size = rng.choice(POOL_SIZES)
+        pool_current = min(pool_size, int(pool_size * rng.betavariate(2, 2) * 1.1))
+        image_count = rng.randint(0, 4)
+        return SellerProduct(
+            id=self.product_id(index),
+            seller_id=self.user_id("seller", seller),
+            name=f"{adjective_en} {noun_en} {model}",
+            nameRw=f"{noun_rw} {adjective_rw} {model}",
+            description=f"{adjective_en} {noun_en.lower()} from a Kivu seller, {category.lower()} range.",
+            descriptionRw=f"{noun_rw} {adjective_rw.lower()} y'umucuruzi wa Kivu.",
+            category=category,
+            image=f"https://picsum.photos/seed/kivu-{self.spec.seed}-{index}/500",
+            images=[f"https://picsum.photos/seed/kivu-{self.spec.seed}-{index}-{n}/800" for n in range(image_count)],
+            regularPrice=regular,
+            perItemPrice=per_item,
+            poolPrice=pool,
+            poolSize=pool_size,
+            poolCurrent=pool_current,
+            poolStatus="closed" if pool_current >= pool_size else "open",
+            rating=round(min(5.0, max(1.0, rng.gauss(4.2, 0.5))), 1),
+            status=_weighted(rng, PRODUCT_STATUSES),
+            created_at=self._timestamp(rng),
+        ).dict()
+
+    def _line(self, rng: random.Random) -> Tuple[int, CartItem]:
+        product = self.popular_product(rng)
+        return product, CartItem(
+            product_id=self.product_id(product),
+            quantity=rng.choice([1, 1, 1, 2, 2, 3]),
+            is_pool_purchase=rng.random() < 0.4,
+        )
+
+    def cart(self, index: int) -> dict:
+        rng = self.rng("cart", index)
+        # Carts are unique per user: index -> buyer is a permutation while carts <= buyers
+        created_at = self._timestamp(rng)
+        return Cart(
+            id=self.record_id("cart", index),
+            user_id=self.user_id("buyer", (index * self._buyer_stride) % self.spec.buyers),
+            items=[self._line(rng)[1] for _ in range(rng.randint(0, 5))],
+            created_at=created_at,
+            updated_at=created_at + timedelta(minutes=rng.randint(0, 60 * 24 * 7)),
+        ).dict()
+
+    def order(self, index: int) -> dict:
+        rng = self.rng("order", index)
+        lines = {}
+        for _ in range(rng.randint(1, 4)):
+            product, line = self._line(rng)
+            lines.setdefault((line.product_id, line.is_pool_purchase), (product, line))  # One line per product/mode
+        items = []
+        total = 0.0
+        for product, line in lines.values():
+            _, _, per_item, pool, seller = self.product_pricing(product)
+            price = pool if line.is_pool_purchase else per_item
+            items.append(OrderItem(**line.dict(), unit_price=price, seller_id=self.user_id("seller", seller)))
+            total += price * line.quantity
+        order_status = _weighted(rng, ORDER_STATUSES)
+        return Order(
+            id=self.record_id("order", index),
+            # Repeat customers: the same skew as product popularity
+            user_id=self.user_id("buyer", self._popular(rng, self.spec.buyers, self._buyer_stride)),
+            items=items,
+            total_amount=round(total, 2),
+            payment_status="failed" if order_status == "cancelled" else "completed",
+            order_status=order_status,
+            created_at=self._timestamp(rng),
+        ).dict()
+
+    # --- streams ---
+
+    def collections(self) -> List[Tuple[str, Iterator[dict]]]:
+        """(collection name, document stream) in insertion order."""
+        spec = self.spec
+        if spec.carts > spec.buyers:
+            raise ValueError("carts cannot exceed buyers (one cart per user)")
+        if (spec.carts or spec.orders) and not (spec.buyers and spec.products):
+            raise ValueError("carts and orders need buyers and products")
+        if spec.products and not spec.sellers:
+            raise ValueError("products need at least one seller")
+
+        def users():
+            for account_type, count in (("seller", spec.sellers), ("admin", spec.admins), ("buyer", spec.buyers)):
+                for index in range(count):
+                    yield self.user(account_type, index)
+
+        return [
+            ("users", users()),
+            ("seller_products", (self.product(index) for index in range(spec.products))),
+            ("carts", (self.cart(index) for index in range(spec.carts))),
+            ("orders", (self.order(index) for index in range(spec.orders))),
+        ]
+
+
+async def write_collection(collection, docs: Iterator[dict], batch_size: int = 1000, writers: int = 4) -> Tuple[int, int]:
+    """
+    insert_many the stream in unordered batches with `writers` concurrent inserts in flight.
+    Generation keeps at most 2 * writers batches ahead of the database.
+    Returns (inserted, duplicates); duplicates are records already present from an earlier run.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=writers * 2)
+    counts = {"inserted": 0, "duplicates": 0}
+
+    async def writer():
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            try:
+                result = await collection.insert_many(batch, ordered=False)
+                counts["inserted"] += len(result.inserted_ids)
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                duplicates = sum(1 for error in write_errors if error.get("code") == 11000)
+                if duplicates != len(write_errors):
+                    raise
+                counts["inserted"] += e.details.get("nInserted", len(batch) - duplicates)
+                counts["duplicates"] += duplicates
+
+    tasks = [asyncio.create_task(writer()) for _ in range(writers)]
+    try:
+        batch = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                await queue.put(batch)
+                batch = []
+                await asyncio.sleep(0)  # Let the writers pick the batch up while the next one is built
+        if batch:
+            await queue.put(batch)
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return counts["inserted"], counts["duplicates"]
+
+
+async def write_dataset(db, generator: DatasetGenerator, batch_size: int = 1000, writers: int = 4) -> Dict[str, dict]:
+    report = {}
+    for name, docs in generator.collections():
+        inserted, duplicates = await write_collection(db[name], docs, batch_size=batch_size, writers=writers)
+        report[name] = {"inserted": inserted, "duplicates": duplicates}
+        logger.info(f"{name}: {inserted} inserted, {duplicates} already present")
+    return report
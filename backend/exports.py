@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from pymongo import ASCENDING
+
+from pagination import encode_cursor
+from serialization import dumps
+
+
+EXPORT_BATCH_SIZE = 1000
+# Oldest first, so records created while a nightly export runs land at its end
+EXPORT_SORT = [("created_at", ASCENDING), ("id", ASCENDING)]
+# Every exported record carries the token that resumes the export right after it
+CURSOR_FIELD = "_cursor"
+
+ORDER_EXPORT_FIELDS = [
+    "id", "user_id", "created_at", "order_status", "payment_status", "total_amount", "idempotency_key", "items",
+]
+PRODUCT_EXPORT_FIELDS = [
+    "id", "seller_id", "status", "created_at", "category", "name", "nameRw", "description", "descriptionRw",
+    "image", "images", "regularPrice", "perItemPrice", "poolPrice", "poolSize", "poolCurrent", "poolStatus", "rating",
+]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def export_query(
+    status_field: str,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> dict:
+    query = {}
+    if status:
+        query[status_field] = status
+    created_at = {}
+    if created_from:
+        created_at["$gte"] = created_from
+    if created_to:
+        created_at["$lt"] = created_to
+    if created_at:
+        query["created_at"] = created_at
+    return query
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str, ensure_ascii=False)
+    return value
+
+
+async def stream_export(collection, query: dict, fmt: str, fields: List[str]) -> AsyncIterator[bytes]:
+    """
+    Yield the matching documents as NDJSON lines or CSV rows, one chunk per cursor batch,
+    so only a single batch is ever held in memory regardless of the export size.
+    `query` must already include any resume condition (see pagination.keyset_query).
+    """
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    cursor = collection.find(query, projection).sort(EXPORT_SORT).batch_size(EXPORT_BATCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=[CURSOR_FIELD] + fields, extrasaction="ignore")
+    if fmt == "csv":
+        writer.writeheader()
+
+    chunk: List[bytes] = []
+    pending = 0
+    async for doc in cursor:
+        doc[CURSOR_FIELD] = encode_cursor(doc)
+        if fmt == "csv":
+            writer.writerow({key: _csv_value(value) for key, value in doc.items()})
+        else:
+            chunk.append(dumps(doc) + b"\n")
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield _flush(fmt, chunk, buffer)
+            pending = 0
+    if pending or (fmt == "csv" and buffer.tell()):
+        yield _flush(fmt, chunk, buffer)
+
+
+def _flush(fmt: str, chunk: List[bytes], buffer: io.StringIO) -> bytes:
+    if fmt == "csv":
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+    data = b"".join(chunk)
+    chunk.clear()
+    return data
@@ -0,0 +1,133 @@
+import os
+import time
+import asyncio
+import bisect
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException, status
+
+from auth import verify_password, get_password_hash
+from metrics import Counter, Gauge, Histogram, stats_collector
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing/verification on a worker pool so it never blocks the event loop.
+
+    At most `workers` hashes run at once and at most `max_queue` more may wait for a
+    worker; anything beyond that is rejected immediately with a 503 so a burst of
+    logins cannot pile up unbounded work behind the rest of the API.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None, kind: str = "thread"):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 8 if max_queue is None else max_queue
+        self.kind = kind
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self.peak_pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self.latency_sum = 0.0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        """Hashes waiting for a worker (excludes the ones currently running)."""
+        return max(self._pending - self.workers, 0)
+
+    async def _run(self, func, *args):
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        self.peak_pending = max(self.peak_pending, self._pending)
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self._pending -= 1
+            self._observe(time.perf_counter() - started)
+
+    def _observe(self, seconds: float):
+        self.completed += 1
+        self.latency_sum += seconds
+        self.latency_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._pending, self.workers),
+            "queue_depth": self.queue_depth,
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "latency_seconds_sum": self.latency_sum,
+            "latency_seconds_buckets": {
+                **{str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.latency_counts)},
+                "+Inf": self.latency_counts[-1],
+            },
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def hasher_from_env() -> PasswordHasher:
+    workers = os.environ.get('PASSWORD_HASH_WORKERS')
+    max_queue = os.environ.get('PASSWORD_HASH_QUEUE')
+    return PasswordHasher(
+        workers=int(workers) if workers else None,
+        max_queue=int(max_queue) if max_queue else None,
+        kind=os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread'),
+    )
+
+
+hash_latency = Histogram(
+    "kivu_password_hash_duration_seconds", "bcrypt hash/verify latency including executor queueing.",
+    buckets=LATENCY_BUCKETS,
+)
+HASHER_METRICS = {
+    "queue_depth": Gauge("kivu_password_hash_queue_depth", "Password hashes waiting for a worker."),
+    "in_flight": Gauge("kivu_password_hash_in_flight", "Password hashes running on a worker."),
+    "rejected": Counter("kivu_password_hash_rejected_total", "Password hashes rejected with a 503."),
+}
+
+
+def hasher_collector(hasher: PasswordHasher) -> Callable[[], List[str]]:
+    """COLLECTORS entry for /api/metrics."""
+    counters = stats_collector(HASHER_METRICS, lambda: [((), hasher.stats())])
+
+    def collect() -> List[str]:
+        hash_latency.set(hasher.latency_counts, hasher.latency_sum)
+        return hash_latency.render() + counters()
+
+    return collect
+
@@ -0,0 +1,172 @@
+import logging
+from typing import List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from catalog import SORT_KEYS, category_facet_pipeline, price_band_facet_pipeline
+
+
+logger = logging.getLogger(__name__)
+
+# Indexes each collection needs for the query shapes served by server.py.
+# create_indexes() is a no-op for indexes that already exist with the same spec,
+# so this can run on every startup.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "carts": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+        IndexModel([("updated_at", ASCENDING)], name="updated"),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_created"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created"),
+        # Only orders that carry a key are indexed ("$gt": "" matches non-empty strings, never null)
+        IndexModel([("user_id", ASCENDING), ("idempotency_key", ASCENDING)], name="user_idempotency_key_unique",
+                   unique=True, partialFilterExpression={"idempotency_key": {"$gt": ""}}),
+    ],
+    "sales_daily": [
+        IndexModel([("seller_id", ASCENDING), ("day", ASCENDING)], name="seller_day"),
+        IndexModel([("day", ASCENDING)], name="day"),
+    ],
+    "seller_products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created"),
+        IndexModel([("seller_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="seller_created"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created"),
+        # Catalog page sorts (walked backwards for price_desc) and the facet counts, which it covers
+        IndexModel([("status", ASCENDING), ("category", ASCENDING), ("poolPrice", ASCENDING), ("id", ASCENDING)],
+                   name="status_category_price_id"),
+        IndexModel([("status", ASCENDING), ("poolPrice", ASCENDING), ("id", ASCENDING)], name="status_price"),
+        IndexModel([("status", ASCENDING), ("rating", DESCENDING), ("id", DESCENDING)], name="status_rating"),
+        IndexModel([("status", ASCENDING), ("poolCurrent", DESCENDING), ("id", DESCENDING)], name="status_popular"),
+    ],
+}
+
+# Representative query shapes issued by the API, with placeholder values: a find (filter +
+# sort) or an aggregation (pipeline). verify_query_shapes() explains each one and reports
+# those the planner answers with a COLLSCAN.
+CATALOG_PROBE = {"status": "approved", "category": "probe", "poolPrice": {"$gte": 50, "$lte": 100}}
+QUERY_SHAPES = [
+    {"name": "login", "collection": "users", "filter": {"email": "probe@kivu.market"}},
+    {"name": "user_by_id", "collection": "users", "filter": {"id": "probe"}},
+    {"name": "cart_by_user", "collection": "carts", "filter": {"user_id": "probe"}},
+    {"name": "stale_carts", "collection": "carts", "filter": {"updated_at": {"$lt": 0}}},
+    {"name": "order_by_id", "collection": "orders", "filter": {"id": "probe", "user_id": "probe"}},
+    {"name": "order_by_idempotency_key", "collection": "orders", "filter": {"user_id": "probe", "idempotency_key": "probe"}},
+    {"name": "orders_by_user", "collection": "orders", "filter": {"user_id": "probe"},
+     "sort": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"name": "orders_by_day", "collection": "orders",
+     "filter": {"created_at": {"$gte": 0, "$lt": 1}, "order_status": {"$nin": ["cancelled"]}},
+     "sort": [("created_at", ASCENDING), ("id", ASCENDING)]},
+    {"name": "seller_sales", "collection": "sales_daily", "filter": {"seller_id": "probe", "day": {"$gte": 0, "$lt": 1}}},
+    {"name": "product_by_id", "collection": "seller_products", "filter": {"id": "probe"}},
+    {"name": "products_by_status", "collection": "seller_products", "filter": {"status": "approved"},
+     "sort": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"name": "products_by_seller", "collection": "seller_products", "filter": {"seller_id": "probe"},
+     "sort": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"name": "products_all", "collection": "seller_products", "filter": {},
+     "sort": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    # status_created walked backwards: oldest unleased pending products first
+    {"name": "moderation_claim", "collection": "seller_products",
+     "filter": {"status": "pending", "$or": [{"lease_expires_at": {"$exists": False}}, {"lease_expires_at": {"$lte": 0}}]},
+     "sort": [("created_at", ASCENDING), ("id", ASCENDING)]},
+    # catalog.fetch_catalog_page(): the page for every sort, the total and both facets
+    *[{"name": f"catalog_page_{sort}", "collection": "seller_products", "filter": CATALOG_PROBE, "sort": keys}
+      for sort, keys in SORT_KEYS.items()],
+    *[{"name": f"catalog_all_{sort}", "collection": "seller_products", "filter": {"status": "approved"}, "sort": keys}
+      for sort, keys in SORT_KEYS.items()],
+    {"name": "catalog_total", "collection": "seller_products", "filter": CATALOG_PROBE},
+    {"name": "catalog_categories", "collection": "seller_products",
+     "pipeline": category_facet_pipeline({"status": "approved", "poolPrice": CATALOG_PROBE["poolPrice"]})},
+    {"name": "catalog_price_bands", "collection": "seller_products",
+     "pipeline": price_band_facet_pipeline({"status": "approved", "category": "probe"})},
+]
+
+
+class IndexBuildError(RuntimeError):
+    """Declared indexes that could not be built, e.g. a unique index blocked by existing duplicates."""
+
+    def __init__(self, failures: List[str]):
+        super().__init__("Could not create indexes: " + "; ".join(failures))
+        self.failures = failures
+
+
+async def ensure_indexes(db, strict: bool = True):
+    """
+    Create every declared index. Indexes are built one by one, so a failing index doesn't
+    block the others. Failures are raised together as IndexBuildError, since a missing unique
+    index silently drops a guarantee the write paths rely on; with strict=False they are
+    only logged.
+    """
+    failures = []
+    for collection, models in INDEXES.items():
+        created = []
+        for model in models:
+            try:
+                created += await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                failures.append(f"{collection}.{model.document['name']}: {e}")
+                logger.error(f"Could not create index '{model.document['name']}' on '{collection}': {e}")
+        logger.info(f"Indexes ready on '{collection}': {', '.join(created)}")
+    if failures and strict:
+        raise IndexBuildError(failures)
+
+
+def _plan_stages(plan) -> List[str]:
+    """Collect every 'stage' name from a (possibly nested) explain plan."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+async def verify_query_shapes(db) -> List[dict]:
+    """Explain every registered query shape and return the ones whose winning plan is a COLLSCAN."""
+    collscans = []
+    for shape in QUERY_SHAPES:
+        if "pipeline" in shape:
+            # The plan of an aggregation's leading $match sits inside its explain output
+            explain = await db.command("aggregate", shape["collection"], pipeline=shape["pipeline"], explain=True)
+            stages = _plan_stages(explain)
+        else:
+            cursor = db[shape["collection"]].find(shape["filter"])
+            if shape.get("sort"):
+                cursor = cursor.sort(shape["sort"])
+            explain = await cursor.explain()
+            stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        if "COLLSCAN" in stages:
+            collscans.append({"name": shape["name"], "collection": shape["collection"], "stages": stages})
+    return collscans
+
+
+async def bootstrap_indexes(db, verify: bool = False, strict: bool = True):
+    await ensure_indexes(db, strict=strict)
+    if not verify:
+        return
+    try:
+        collscans = await verify_query_shapes(db)
+    except Exception as e:
+        logger.error(f"Index verification failed: {e}")
+        return
+    for shape in collscans:
+        logger.warning(f"Query shape '{shape['name']}' on '{shape['collection']}' uses COLLSCAN: {shape['stages']}")
+    if not collscans:
+        logger.info("All registered query shapes are index-backed")
+
+
+# Manual run: python indexes.py (creates the indexes and reports COLLSCAN query shapes)
+if __name__ == "__main__":
+    from mongo import run_script
+
+    run_script(lambda db: bootstrap_indexes(db, verify=True))
@@ -0,0 +1,222 @@
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from pymongo import monitoring
+
+
+# Seconds. Wide enough to cover a cached catalog page (~1ms) and a bcrypt login (~250ms+)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Requests that match no route share one label so random URLs can't grow the label set
+UNMATCHED_ROUTE = "unmatched"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        # Mongo events arrive on driver threads, requests on the event loop
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value: float, *labels):
+        """Overwrite a series with a total that is counted elsewhere (see stats_collector)."""
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram. Counts are kept per bucket and made cumulative only when rendered."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = REQUEST_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [per-bucket counts incl. +Inf, sum]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def set(self, counts: List[int], total: float, *labels):
+        """Overwrite a series with per-bucket counts (last one is +Inf) kept elsewhere."""
+        with self._lock:
+            self._series[labels] = [list(counts), total]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in series:
+            lines.extend(histogram_lines(self.name, self.labelnames, key, self.buckets, counts, total))
+        return lines
+
+
+def histogram_lines(name: str, labelnames: Tuple[str, ...], key: Tuple, buckets, counts: List[int], total: float) -> List[str]:
+    """Render one histogram series from non-cumulative per-bucket counts (last one is +Inf)."""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(buckets) + ["+Inf"], counts):
+        cumulative += count
+        le = f'le="{bound}"'
+        lines.append(f"{name}_bucket{_labels(labelnames, key, le)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(labelnames, key)} {_number(total)}")
+    lines.append(f"{name}_count{_labels(labelnames, key)} {cumulative}")
+    return lines
+
+
+http_requests = Counter("kivu_http_requests_total", "HTTP requests by route, method and status code.", ("method", "route", "status"))
+http_latency = Histogram("kivu_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+http_in_flight = Gauge("kivu_http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+mongo_latency = Histogram(
+    "kivu_mongo_command_duration_seconds", "MongoDB command latency by collection and command.",
+    ("collection", "command"), buckets=MONGO_BUCKETS,
+)
+mongo_failures = Counter("kivu_mongo_command_failures_total", "Failed MongoDB commands.", ("collection", "command"))
+
+METRICS: List[_Metric] = [http_requests, http_latency, http_in_flight, mongo_latency, mongo_failures]
+# Components that keep their own counts (caches, password hashing ...) are read at scrape
+# time; the app registers one collector per component, each returning exposition lines
+COLLECTORS: List[Callable[[], List[str]]] = []
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in COLLECTORS:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+def stats_collector(metrics: Dict[str, _Metric], read: Callable[[], Iterable[Tuple[Tuple, Dict[str, Any]]]]) -> Callable[[], List[str]]:
+    """
+    A COLLECTORS entry for a component that counts in its own stats. On every scrape,
+    read() yields (label values, stats) pairs, and each stats field is set on the
+    metric registered for it.
+    """
+    def collect() -> List[str]:
+        for labels, stats in read():
+            for field, metric in metrics.items():
+                if field in stats:
+                    metric.set(stats[field], *labels)
+        return [line for metric in metrics.values() for line in metric.render()]
+
+    return collect
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task/queue overhead). The route label is the
+    matched path template (e.g. /api/products/{product_id}), which FastAPI leaves in the scope.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(method)
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or UNMATCHED_ROUTE
+            http_latency.observe(time.perf_counter() - started, method, route_label)
+            http_requests.inc(method, route_label, str(status_code))
+
+
+class CommandTimer(monitoring.CommandListener):
+    """pymongo command listener timing every command by collection and command name."""
+
+    def __init__(self):
+        self._started: Dict[Tuple, Tuple[str, str]] = {}
+
+    def started(self, event):
+        # For CRUD commands the collection name is the command's first value; getMore names it separately
+        target = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else ""
+        self._started[(event.connection_id, event.request_id)] = (collection, event.command_name)
+
+    def _finish(self, event) -> Tuple[str, str]:
+        labels = self._started.pop((event.connection_id, event.request_id), ("", event.command_name))
+        mongo_latency.observe(event.duration_micros / 1e6, *labels)
+        return labels
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        mongo_failures.inc(*self._finish(event))
+
+
+command_timer = CommandTimer()
+
@@ -0,0 +1,217 @@
+"""
+Versioned, resumable data migrations.
+
+A migration walks each of its collections in `_id` order, one batch at a time, and
+writes the changed documents with a single unordered bulk_write per batch. After every
+batch the last `_id` is checkpointed in the `migrations` collection, so a run that is
+interrupted resumes where it stopped, and a finished migration is never run again.
+
+Runs throttle themselves: after a batch that took t seconds the runner sleeps long enough
+to keep its share of wall time at MIGRATION_DUTY_CYCLE (and at least MIGRATION_PAUSE_MS),
+leaving the database to live traffic the rest of the time.
+
+    python migrations.py             # apply pending migrations
+    python migrations.py --status    # show checkpoints
+"""
+import abc
+import argparse
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTS = "migrations"
+BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", 500))
+DUTY_CYCLE = float(os.environ.get("MIGRATION_DUTY_CYCLE", 0.5))
+PAUSE_MS = float(os.environ.get("MIGRATION_PAUSE_MS", 50))
+# A runner that stops checkpointing for this long is presumed dead and its run can be taken over
+LEASE_SECONDS = 300
+
+
+class Migration(abc.ABC):
+    version: int
+    description: str
+    collections: List[str] = []
+
+    def query(self, collection: str) -> dict:
+        """Documents that still need the migration (combined with the `_id` range)."""
+        return {}
+
+    @abc.abstractmethod
+    def update(self, collection: str, doc: dict) -> Optional[UpdateOne]:
+        """The write for one matched document, or None to leave it as is."""
+
+
+class NormalizeCreatedAt(Migration):
+    """
+    Documents written by the old seed.py stored created_at as asyncio's loop.time(): seconds
+    on a monotonic clock, not a point in time, so the value can't be converted. The insert
+    time is recovered from the ObjectId instead, which is when the seed actually ran.
+    """
+    version = 1
+    description = "Normalize numeric created_at to datetime in seller_products and users"
+    collections = ["seller_products", "users"]
+
+    NUMERIC = {"$type": "number"}  # double, int, long or decimal
+
+    def query(self, collection: str) -> dict:
+        return {"created_at": self.NUMERIC}
+
+    def update(self, collection: str, doc: dict) -> Optional[UpdateOne]:
+        if not isinstance(doc["_id"], ObjectId):
+            logger.warning(f"{collection} {doc['_id']}: numeric created_at but no ObjectId to date it; skipped")
+            return None
+        created_at = doc["_id"].generation_time.replace(tzinfo=None)
+        # Matching on the old value keeps a concurrent write to created_at from being overwritten
+        return UpdateOne({"_id": doc["_id"], "created_at": doc["created_at"]}, {"$set": {"created_at": created_at}})
+
+
+class BackfillPoolStatus(Migration):
+    """
+    poolStatus was added to SellerProduct with a model default of "open". Products written
+    before that have no stored value, so the trusted list endpoints omit the field while
+    /products/{id} (which builds the model) reports "open", even for a full pool.
+    """
+    version = 2
+    description = "Store poolStatus on seller_products that predate it"
+    collections = ["seller_products"]
+
+    def query(self, collection: str) -> dict:
+        return {"poolStatus": {"$exists": False}}
+
+    def update(self, collection: str, doc: dict) -> Optional[UpdateOne]:
+        # Derived from the stored counters at write time, so a concurrent reservation can't be undone
+        return UpdateOne(
+            {"_id": doc["_id"], "poolStatus": {"$exists": False}},
+            [{"$set": {"poolStatus": {"$cond": [{"$gte": ["$poolCurrent", "$poolSize"]}, "closed", "open"]}}}],
+        )
+
+
+MIGRATIONS: List[Migration] = [NormalizeCreatedAt(), BackfillPoolStatus()]
+
+
+async def _claim(db, migration: Migration, owner: str) -> Optional[dict]:
+    now = datetime.utcnow()
+    await db[CHECKPOINTS].update_one(
+        {"_id": migration.version},
+        {"$setOnInsert": {"description": migration.description, "status": "pending", "progress": {}, "counts": {}}},
+        upsert=True,
+    )
+    return await db[CHECKPOINTS].find_one_and_update(
+        {
+            "_id": migration.version,
+            "$or": [{"status": "pending"}, {"status": "running", "lease_expires_at": {"$lte": now}}],
+        },
+        {"$set": {"status": "running", "owner": owner, "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS)},
+         "$min": {"started_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _checkpoint(db, migration: Migration, owner: str, collection: str, last_id, scanned: int, modified: int) -> bool:
+    result = await db[CHECKPOINTS].update_one(
+        {"_id": migration.version, "owner": owner},
+        {
+            "$set": {f"progress.{collection}": last_id,
+                     "lease_expires_at": datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)},
+            "$inc": {f"counts.{collection}.scanned": scanned, f"counts.{collection}.modified": modified},
+        },
+    )
+    return result.matched_count == 1
+
+
+async def _throttle(batch_seconds: float, duty_cycle: float, pause_ms: float):
+    idle = batch_seconds * (1 - duty_cycle) / duty_cycle if 0 < duty_cycle < 1 else 0
+    await asyncio.sleep(max(idle, pause_ms / 1000))
+
+
+async def run_migration(
+    db,
+    migration: Migration,
+    batch_size: int = BATCH_SIZE,
+    duty_cycle: float = DUTY_CYCLE,
+    pause_ms: float = PAUSE_MS,
+    dry_run: bool = False,
+) -> bool:
+    """Apply one migration from its checkpoint. Returns False if another runner holds it."""
+    owner = str(uuid.uuid4())
+    state = await _claim(db, migration, owner)
+    if state is None:
+        logger.info(f"Migration {migration.version} is running elsewhere or already done")
+        return False
+
+    for collection in migration.collections:
+        last_id = state["progress"].get(collection)
+        while True:
+            started = time.perf_counter()
+            query = migration.query(collection)
+            if last_id is not None:
+                query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+            batch = await db[collection].find(query).sort("_id", ASCENDING).limit(batch_size).to_list(length=batch_size)
+            if not batch:
+                break
+            operations = [op for op in (migration.update(collection, doc) for doc in batch) if op is not None]
+            modified = 0
+            if operations and not dry_run:
+                modified = (await db[collection].bulk_write(operations, ordered=False)).modified_count
+            last_id = batch[-1]["_id"]
+            if not dry_run and not await _checkpoint(db, migration, owner, collection, last_id, len(batch), modified):
+                logger.error(f"Migration {migration.version} lease lost; stopping")
+                return False
+            logger.info(f"Migration {migration.version} {collection}: {len(operations)} updates up to _id {last_id}")
+            await _throttle(time.perf_counter() - started, duty_cycle, pause_ms)
+
+    if dry_run:
+        # Leave it claimable for the real run
+        await db[CHECKPOINTS].update_one({"_id": migration.version, "owner": owner}, {"$set": {"status": "pending"}})
+    else:
+        await db[CHECKPOINTS].update_one(
+            {"_id": migration.version, "owner": owner},
+            {"$set": {"status": "done", "finished_at": datetime.utcnow()}, "$unset": {"lease_expires_at": ""}},
+        )
+        logger.info(f"Migration {migration.version} done: {migration.description}")
+    return True
+
+
+async def run_pending(db, **options) -> List[int]:
+    """Apply every migration that isn't done, in version order. Returns the versions applied."""
+    done = {doc["_id"] async for doc in db[CHECKPOINTS].find({"status": "done"}, {"_id": 1})}
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        if not await run_migration(db, migration, **options):
+            break  # Later migrations may depend on this one
+        applied.append(migration.version)
+    return applied
+
+
+if __name__ == "__main__":
+    from mongo import run_script
+
+    parser = argparse.ArgumentParser(description="Apply pending data migrations")
+    parser.add_argument("--status", action="store_true", help="print checkpoints and exit")
+    parser.add_argument("--dry-run", action="store_true", help="scan and log without writing")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--duty-cycle", type=float, default=DUTY_CYCLE)
+    parser.add_argument("--pause-ms", type=float, default=PAUSE_MS)
+    args = parser.parse_args()
+
+    async def main(db):
+        if args.status:
+            async for doc in db[CHECKPOINTS].find().sort("_id", ASCENDING):
+                print(doc)
+            return
+        await run_pending(db, batch_size=args.batch_size, duty_cycle=args.duty_cycle,
+                          pause_ms=args.pause_ms, dry_run=args.dry_run)
+
+    run_script(main)
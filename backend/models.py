@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List, Literal
 from datetime import datetime
 import uuid
 
@@ -9,6 +9,7 @@ class User(BaseModel):
     name: str
     password_hash: str
     account_type: str = "buyer"  # buyer or seller
+    token_version: int = 0  # Увеличивается при смене роли, чтобы отозвать старые токены
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
 class UserCreate(BaseModel):
@@ -17,6 +18,9 @@ class UserCreate(BaseModel):
     password: str
     account_type: str = "buyer"
 
+class AccountTypeUpdate(BaseModel):
+    account_type: Literal["buyer", "seller", "admin"]
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -41,6 +45,14 @@ class CartItem(BaseModel):
     quantity: int
     is_pool_purchase: bool = False
 
+class CartItemDelta(BaseModel):
+    product_id: str
+    quantity: int  # Положительное значение добавляет, отрицательное уменьшает количество
+    is_pool_purchase: bool = False
+
+class CartPatch(BaseModel):
+    items: List[CartItemDelta]
+
 class Cart(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -48,20 +60,28 @@ class Cart(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class OrderItem(CartItem):
+    # Цена за единицу на момент заказа, рассчитывается сервером из perItemPrice/poolPrice
+    unit_price: Optional[float] = None
+    # Продавец на момент заказа, для аналитики продаж (analytics.py); у старых заказов отсутствует
+    seller_id: Optional[str] = None
+
 class Order(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     # --- ИЗМЕНЕНИЕ ---
-    # Мы храним CartItem целиком
-    items: List[CartItem] 
+    # Мы храним CartItem целиком (плюс цену за единицу)
+    items: List[OrderItem]
     total_amount: float
+    idempotency_key: Optional[str] = None
     payment_status: str = "pending"  # pending, completed, failed
     order_status: str = "processing"  # processing, shipped, delivered, cancelled
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
 class OrderCreate(BaseModel):
     items: List[CartItem]
-    total_amount: float
+    # Больше не используется: сумма заказа рассчитывается на сервере
+    total_amount: Optional[float] = None
 
 # --- ИЗМЕНЕНИЕ: Модель SellerProduct теперь содержит ВСЕ поля ---
 class SellerProduct(BaseModel):
@@ -82,6 +102,7 @@ class SellerProduct(BaseModel):
     poolSize: int # Добавлено
     poolCurrent: int # Добавлено
     rating: float # Добавлено
+    poolStatus: str = "open"  # open, closed (закрывается, когда poolCurrent достигает poolSize)
 
     status: str = "pending"  # pending, approved, rejected
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -102,4 +123,107 @@ class SellerProductCreate(BaseModel):
     
     poolSize: int
     poolCurrent: int
-    rating: float
\ No newline at end of file
+    rating: float
+
+class CatalogFacetCount(BaseModel):
+    value: str
+    count: int
+
+class CatalogFacets(BaseModel):
+    categories: List[CatalogFacetCount] = []
+    price_bands: List[CatalogFacetCount] = []
+
+class CatalogPage(BaseModel):
+    items: List[SellerProduct]
+    total: int
+    facets: CatalogFacets
+
+class ModerationFilter(BaseModel):
+    status: str = "pending"
+    category: Optional[str] = None
+    seller_id: Optional[str] = None
+    created_before: Optional[datetime] = None
+
+class BulkModerationRequest(BaseModel):
+    action: Literal["approve", "reject"]
+    # Либо явный список id, либо фильтр (ровно одно из двух)
+    ids: Optional[List[str]] = None
+    filter: Optional[ModerationFilter] = None
+
+class BulkModerationResult(BaseModel):
+    matched: int
+    modified: int
+
+class ModerationRelease(BaseModel):
+    ids: List[str]
+
+class CategoryStats(BaseModel):
+    value: str
+    count: int
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+class CatalogStats(BaseModel):
+    # Цены — poolPrice, как и в фильтрах каталога
+    total: int
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    categories: List[CategoryStats] = []
+    price_bands: List[CatalogFacetCount] = []
+    statuses: List[CatalogFacetCount] = []
+
+class SalesTotals(BaseModel):
+    units: int
+    revenue: float
+    pool_units: int
+    pool_revenue: float
+    regular_units: int
+    regular_revenue: float
+    pool_share: float  # Доля штук, купленных через пул
+
+class SalesTrend(BaseModel):
+    revenue_per_day_slope: float
+    # Вторая половина периода относительно первой; None, если в первой продаж не было
+    revenue_change: Optional[float] = None
+    units_change: Optional[float] = None
+
+class DailySales(BaseModel):
+    day: datetime
+    units: int
+    revenue: float
+    pool_units: int
+    pool_revenue: float
+    revenue_avg: float  # Скользящее среднее выручки за 7 дней
+
+class ProductSales(BaseModel):
+    product_id: str
+    name: Optional[str] = None
+    units: int
+    revenue: float
+    orders: int
+    pool_share: float
+    revenue_share: float
+    revenue_percentile: float
+
+class SellerAnalytics(BaseModel):
+    seller_id: str
+    start: datetime
+    days: int
+    totals: SalesTotals
+    trend: SalesTrend
+    daily_revenue_percentiles: Dict[str, float]
+    product_revenue_percentiles: Dict[str, float]
+    daily: List[DailySales]
+    products: List[ProductSales]
+
+class SearchSuggestion(BaseModel):
+    id: str
+    name: str
+    nameRw: str
+    image: str
+    category: str
+    poolPrice: float
+    rating: float
+    poolCurrent: int
+    poolSize: int
+    score: float
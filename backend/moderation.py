@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pymongo import ASCENDING, ReturnDocument
+
+from models import ModerationFilter
+
+
+ACTION_STATUS = {"approve": "approved", "reject": "rejected"}
+LEASE_FIELDS = {"lease_owner": "", "lease_expires_at": ""}
+MAX_CLAIM_BATCH = 50
+# What catalog_stats needs to move a product between buckets
+MOVED_PROJECTION = {"_id": 0, "id": 1, "status": 1, "category": 1, "poolPrice": 1}
+
+
+def moderation_query(ids: Optional[List[str]], filter: Optional[ModerationFilter]) -> dict:
+    if (ids is None) == (filter is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either ids or filter"
+        )
+    if ids is not None:
+        return {"id": {"$in": ids}}
+    query = {"status": filter.status}
+    if filter.category:
+        query["category"] = filter.category
+    if filter.seller_id:
+        query["seller_id"] = filter.seller_id
+    if filter.created_before:
+        query["created_at"] = {"$lt": filter.created_before}
+    return query
+
+
+async def bulk_moderate(
+    db, action: str, ids: Optional[List[str]], filter: Optional[ModerationFilter]
+) -> Tuple[int, int, Optional[List[dict]]]:
+    """
+    Apply approve/reject to every matching product; moderated items lose their lease.
+    Returns (matched, modified, moved). `moved` is the pre-update state of every product
+    whose status changed, or None when that is unknown.
+
+    An id list is read first (status, category, poolPrice) and then updated with one
+    update_many per previous status, guarded by that status. If a concurrent write
+    changed a product in between, the modified count comes up short and `moved` is None.
+    A filter is applied with a single update_many and its previous states aren't read.
+    """
+    new_status = ACTION_STATUS[action]
+    query = moderation_query(ids, filter)
+    update = {"$set": {"status": new_status}, "$unset": LEASE_FIELDS}
+    # Products already in the target status are left untouched, so modified == status transitions
+    if filter is not None:
+        result = await db.seller_products.update_many({"$and": [query, {"status": {"$ne": new_status}}]}, update)
+        return result.matched_count, result.modified_count, None
+
+    previous = await db.seller_products.find(
+        {"id": {"$in": ids}, "status": {"$ne": new_status}}, MOVED_PROJECTION
+    ).to_list(length=len(ids))
+    by_status: Dict[str, List[str]] = {}
+    for product in previous:
+        by_status.setdefault(product.get("status"), []).append(product["id"])
+    matched = modified = 0
+    for old_status, group in by_status.items():
+        result = await db.seller_products.update_many({"id": {"$in": group}, "status": old_status}, update)
+        matched += result.matched_count
+        modified += result.modified_count
+    return matched, modified, previous if modified == len(previous) else None
+
+
+def listing_changed(action: str, ids: Optional[List[str]], filter: Optional[ModerationFilter], modified: int) -> bool:
+    """Whether a bulk action may have moved products into or out of the approved listing."""
+    if not modified:
+        return False
+    # A reject only shifts the listing if it could have touched approved products
+    return action == "approve" or filter is None or filter.status == "approved"
+
+
+async def claim_pending(db, admin_id: str, batch: int = 10, lease_seconds: int = 300) -> List[dict]:
+    """
+    Hand out up to `batch` pending products, oldest first, under an expiring lease.
+
+    Each item is claimed with its own find_one_and_update that only matches unleased or
+    expired items, so two moderators can never be handed the same product. Leases that
+    run out (a moderator closed the tab) make the item claimable again.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=lease_seconds)
+    claimed = []
+    for _ in range(min(batch, MAX_CLAIM_BATCH)):
+        product = await db.seller_products.find_one_and_update(
+            {
+                "status": "pending",
+                "$or": [
+                    {"lease_expires_at": {"$exists": False}},
+                    {"lease_expires_at": {"$lte": now}},
+                ],
+            },
+            {"$set": {"lease_owner": admin_id, "lease_expires_at": expires_at}},
+            sort=[("created_at", ASCENDING), ("id", ASCENDING)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        if product is None:
+            break
+        claimed.append(product)
+    return claimed
+
+
+async def release_leases(db, admin_id: str, ids: List[str]) -> int:
+    """Give back leased items without moderating them (only the moderator's own leases)."""
+    result = await db.seller_products.update_many(
+        {"id": {"$in": ids}, "lease_owner": admin_id},
+        {"$unset": LEASE_FIELDS}
+    )
+    return result.modified_count
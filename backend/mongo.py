@@ -0,0 +1,37 @@
+"""
+Helpers for code that talks to Mongo outside a request: the command-line entry points
+of the maintenance modules (python indexes.py, migrations.py, seed.py ...) and the
+background rebuilds.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+
+def mongo_now() -> datetime:
+    """
+    utcnow() truncated to what Mongo stores (milliseconds), so a timestamp written by a
+    rebuild compares equal to itself when it is read back or used in a cleanup filter.
+    """
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def run_script(task: Callable[[Any], Awaitable[Any]]) -> Any:
+    """Entry point for the maintenance scripts: load backend/.env, run task(db) against DB_NAME, close the client."""
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            return await task(client[os.environ['DB_NAME']])
+        finally:
+            client.close()
+
+    return asyncio.run(main())
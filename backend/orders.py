@@ -0,0 +1,150 @@
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from analytics import record_order_sales
+from models import CartItem, Order, OrderItem
+from pools import reserve_order_pools, release_reservations
+from pricing import load_products, price_items
+
+
+logger = logging.getLogger(__name__)
+
+_transactions_supported: Optional[bool] = None
+
+
+async def supports_transactions(client) -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster; checked once per process."""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await client.admin.command("hello")
+            _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _transactions_supported = False
+        logger.info(f"Order writes use {'transactions' if _transactions_supported else 'idempotent single writes'}")
+    return _transactions_supported
+
+
+async def find_order_by_key(db, user_id: str, idempotency_key: str) -> Optional[dict]:
+    return await db.orders.find_one({"user_id": user_id, "idempotency_key": idempotency_key}, {"_id": 0})
+
+
+async def price_order(db, user_id: str, items: List[CartItem], idempotency_key: Optional[str] = None) -> Order:
+    """Build the order from one batched product read; the total never comes from the client."""
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order has no items")
+    item_dicts = [item.dict() for item in items]
+    if any(item["quantity"] <= 0 for item in item_dicts):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantities must be positive")
+    products = await load_products(db, (item["product_id"] for item in item_dicts))
+    unavailable = sorted({
+        item["product_id"] for item in item_dicts
+        if products.get(item["product_id"], {}).get("status") != "approved"
+    })
+    if unavailable:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Products not available: {', '.join(unavailable)}"
+        )
+
+    priced = price_items(item_dicts, products)
+    return Order(
+        user_id=user_id,
+        items=[
+            OrderItem(
+                product_id=line["product_id"],
+                quantity=line["quantity"],
+                is_pool_purchase=line["is_pool_purchase"],
+                unit_price=line["unit_price"],
+                seller_id=line["product"].get("seller_id"),
+            )
+            for line in priced["items"]
+        ],
+        total_amount=priced["subtotal"],
+        idempotency_key=idempotency_key,
+    )
+
+
+def _pool_full(product_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Not enough pool slots left for product {product_id}"
+    )
+
+
+async def _write_in_transaction(db, client, order_doc: dict) -> List[Tuple[str, int]]:
+    async def write(session):
+        reserved, full_product_id = await reserve_order_pools(db, order_doc["items"], session=session)
+        if full_product_id:
+            raise _pool_full(full_product_id)  # Aborts the transaction, undoing any reservation
+        await db.orders.insert_one(dict(order_doc), session=session)
+        await db.carts.update_one(
+            {"user_id": order_doc["user_id"]},
+            {"$set": {"items": [], "updated_at": datetime.utcnow()}},
+            session=session
+        )
+        return reserved
+
+    async with await client.start_session() as session:
+        return await session.with_transaction(write)
+
+
+async def _write_without_transaction(db, order_doc: dict) -> List[Tuple[str, int]]:
+    # Pool slots are taken first and given back if the order is not inserted. The insert is
+    # idempotent through the unique (user_id, idempotency_key) index.
+    reserved, full_product_id = await reserve_order_pools(db, order_doc["items"])
+    if full_product_id:
+        raise _pool_full(full_product_id)
+    try:
+        await db.orders.insert_one(dict(order_doc))
+    except PyMongoError:
+        await release_reservations(db, reserved)
+        raise
+    try:
+        await db.carts.update_one(
+            {"user_id": order_doc["user_id"]},
+            {"$set": {"items": [], "updated_at": datetime.utcnow()}}
+        )
+    except PyMongoError as e:
+        # The order stands; a cart left behind is harmless compared to losing the order
+        logger.error(f"Order {order_doc['id']} created but cart was not cleared: {e}")
+    return reserved
+
+
+async def place_order(
+    db,
+    client,
+    user_id: str,
+    items: List[CartItem],
+    idempotency_key: Optional[str] = None,
+) -> Tuple[dict, List[Tuple[str, int]]]:
+    """
+    Price and persist an order: reserve pool slots, insert the order and clear the cart,
+    in one transaction where the deployment supports it.
+
+    A retry carrying an already used idempotency key returns the original order without
+    doing any work. Returns the order document and the pool reservations that were made.
+    """
+    if idempotency_key:
+        existing = await find_order_by_key(db, user_id, idempotency_key)
+        if existing:
+            return existing, []
+
+    order_doc = (await price_order(db, user_id, items, idempotency_key)).dict()
+    try:
+        if await supports_transactions(client):
+            reserved = await _write_in_transaction(db, client, order_doc)
+        else:
+            reserved = await _write_without_transaction(db, order_doc)
+    except DuplicateKeyError:
+        # A concurrent retry with the same key won the race
+        existing = await find_order_by_key(db, user_id, idempotency_key) if idempotency_key else None
+        if existing:
+            return existing, []
+        raise
+    await record_order_sales(db, order_doc)
+    return order_doc, reserved
@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple, List
+
+from fastapi import HTTPException, status
+
+
+# Every list endpoint sorts newest first with "id" as a stable tiebreak, so a
+# (created_at, id) pair identifies a position in the listing exactly.
+KEYSET_SORT = [("created_at", -1), ("id", -1)]
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(doc: dict) -> str:
+    created_at = doc.get("created_at")
+    if isinstance(created_at, datetime):
+        value = {"d": created_at.isoformat()}
+    else:
+        # Legacy seed documents store created_at as a float
+        value = {"n": created_at}
+    payload = json.dumps({"c": value, "i": doc["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[object, str]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = payload["c"]
+        created_at = datetime.fromisoformat(value["d"]) if "d" in value else value["n"]
+        return created_at, str(payload["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_query(query: dict, cursor: Optional[str], ascending: bool = False) -> dict:
+    """
+    Restrict query to documents strictly after the cursor position in KEYSET_SORT order
+    (or in the reverse, oldest-first order when ascending=True).
+    """
+    if not cursor:
+        return query
+    created_at, last_id = decode_cursor(cursor)
+    op = "$gt" if ascending else "$lt"
+    conditions = [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "id": {op: last_id}},
+    ]
+    # Comparisons only match values of the same BSON type, and Mongo sorts numbers
+    # before dates. Legacy float timestamps therefore all follow a date cursor in
+    # newest-first order, and all dates follow a float cursor in oldest-first order.
+    if ascending and not isinstance(created_at, datetime):
+        conditions.append({"created_at": {"$type": "date"}})
+    elif not ascending and isinstance(created_at, datetime):
+        conditions.append({"created_at": {"$type": "number"}})
+    after = {"$or": conditions}
+    return {"$and": [query, after]} if query else after
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20,
+    projection: Optional[dict] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch one page in KEYSET_SORT order. With a cursor the page is located by an
+    index seek and skip is ignored; without one the old skip/limit behaviour is kept.
+    Returns the documents and the cursor for the following page (None on the last page).
+    """
+    limit = max(limit, 1)
+    # The cursor is built from the last document, so an inclusion projection must still read its sort keys
+    inclusion = bool(projection) and any(value for key, value in projection.items() if key != "_id")
+    find_projection = {**projection, "id": 1, "created_at": 1} if inclusion else projection
+    find_cursor = collection.find(keyset_query(query, cursor), find_projection).sort(KEYSET_SORT)
+    if not cursor and skip:
+        find_cursor = find_cursor.skip(skip)
+    # One extra document tells us whether another page exists
+    docs = await find_cursor.limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+    if inclusion and not projection.get("created_at"):
+        for doc in docs:
+            doc.pop("created_at", None)
+    return docs, next_cursor
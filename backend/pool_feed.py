@@ -0,0 +1,258 @@
+"""
+Live pool progress over server-sent events (GET /api/pools/stream).
+
+Order handlers report which products' pools changed; they don't send the new values.
+The broadcaster collects those ids for POOL_FEED_COALESCE_MS, then reads all of them
+with one query and fans each pool out to the subscribers of its product and of its
+category. A burst of orders on a popular product costs one read and one event per
+window, however many buyers are watching.
+
+Every connection has its own pending map, keyed by product id, where the latest value
+wins. A client that reads slowly skips intermediate values rather than queueing them.
+A connection that would need more than POOL_FEED_MAX_PENDING distinct pending products
+gets a `resync` event and is closed, so the client re-fetches. Memory per connection
+stays bounded.
+
+Writes made by other server processes are picked up by re-reading the directly
+subscribed products every POOL_FEED_REFRESH_SECONDS. Events for those products are
+only sent when a value differs from the last one pushed.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi import HTTPException, status
+from pymongo.errors import PyMongoError
+
+from metrics import Counter, Gauge, stats_collector
+
+
+logger = logging.getLogger(__name__)
+
+FEED_PROJECTION = {"_id": 0, "id": 1, "category": 1, "poolCurrent": 1, "poolSize": 1, "poolStatus": 1}
+READ_CHUNK = 500
+HEARTBEAT_SECONDS = 15
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _pool_state(pool: dict) -> tuple:
+    return pool.get("poolCurrent"), pool.get("poolSize"), pool.get("poolStatus")
+
+
+def sse_event(event: str, data, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    def __init__(self, products: Set[str], categories: Set[str], max_pending: int):
+        self.products = products
+        self.categories = categories
+        self.max_pending = max_pending
+        self.overflowed = False
+        self._pending: Dict[str, dict] = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, pool: dict) -> bool:
+        """Queue a pool update; returns False if this connection has just overflowed."""
+        if self.overflowed:
+            return True
+        if pool["id"] not in self._pending and len(self._pending) >= self.max_pending:
+            self.overflowed = True
+            self._pending.clear()
+            self._ready.set()
+            return False
+        self._pending[pool["id"]] = pool
+        self._ready.set()
+        return True
+
+    async def next_batch(self, timeout: float) -> List[dict]:
+        """Pending updates, waiting up to `timeout`; empty on timeout."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        batch = list(self._pending.values())
+        self._pending.clear()
+        return batch
+
+
+class PoolBroadcaster:
+    def __init__(
+        self,
+        coalesce_ms: float = 250,
+        max_subscribers: int = 10000,
+        max_pending: int = 256,
+        refresh_seconds: float = 5,
+        max_products: int = 50,
+    ):
+        self.coalesce = coalesce_ms / 1000
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self.refresh_seconds = refresh_seconds
+        self.max_products = max_products
+        self._subscriptions: Set[Subscription] = set()
+        self._by_product: Dict[str, Set[Subscription]] = {}
+        self._by_category: Dict[str, Set[Subscription]] = {}
+        # Last state pushed per directly subscribed product; lets the refresh skip unchanged pools
+        self._last: Dict[str, tuple] = {}
+        self._dirty: Set[str] = set()
+        self._wake = asyncio.Event()
+        self._sequence = 0
+        self.reads = 0
+        self.events = 0
+        self.overflows = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
+
+    def open(self, products: Iterable[str], categories: Iterable[str]) -> Subscription:
+        """
+        Validate a stream request. The subscription is only registered once its stream
+        starts, so a response that is never sent leaves nothing behind.
+        """
+        products, categories = set(products), set(categories)
+        if not products and not categories:
+            raise HTTPException(status_code=400, detail="Subscribe to at least one product or category")
+        if len(products) > self.max_products:
+            raise HTTPException(status_code=400, detail=f"At most {self.max_products} products per stream")
+        if len(self._subscriptions) >= self.max_subscribers:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many live streams, please retry",
+                headers={"Retry-After": str(HEARTBEAT_SECONDS)},
+            )
+        return Subscription(products, categories, self.max_pending)
+
+    def _register(self, subscription: Subscription):
+        self._subscriptions.add(subscription)
+        for product_id in subscription.products:
+            self._by_product.setdefault(product_id, set()).add(subscription)
+        for category in subscription.categories:
+            self._by_category.setdefault(category, set()).add(subscription)
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+        for key, index in [(p, self._by_product) for p in subscription.products] + \
+                          [(c, self._by_category) for c in subscription.categories]:
+            subscribers = index.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del index[key]
+                    if index is self._by_product:
+                        self._last.pop(key, None)
+
+    def pool_changed(self, product_id: str):
+        """Mark a product's pool as changed; the new value is read on the next flush."""
+        if self._subscriptions:
+            self._dirty.add(product_id)
+            self._wake.set()
+
+    def _fan_out(self, pool: dict, only_if_changed: bool = False):
+        state = _pool_state(pool)
+        direct = self._by_product.get(pool["id"], ())
+        if direct:
+            if only_if_changed and self._last.get(pool["id"]) == state:
+                return
+            self._last[pool["id"]] = state
+        elif only_if_changed:
+            return
+        for subscription in set(direct) | self._by_category.get(pool.get("category"), set()):
+            if not subscription.offer(pool):
+                self.overflows += 1
+            self.events += 1
+
+    async def _read(self, db, product_ids: List[str]) -> List[dict]:
+        pools = []
+        for start in range(0, len(product_ids), READ_CHUNK):
+            chunk = product_ids[start:start + READ_CHUNK]
+            self.reads += 1
+            pools += await db.seller_products.find({"id": {"$in": chunk}}, FEED_PROJECTION).to_list(length=len(chunk))
+        return pools
+
+    async def flush(self, db, refresh: bool = False):
+        dirty, self._dirty = self._dirty, set()
+        refreshed = set(self._by_product) - dirty if refresh else set()
+        if not dirty and not refreshed:
+            return
+        for pool in await self._read(db, sorted(dirty | refreshed)):
+            self._fan_out(pool, only_if_changed=pool["id"] not in dirty)
+
+    async def run(self, db):
+        """Flush loop; started once at application startup."""
+        next_refresh = time.monotonic() + self.refresh_seconds
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(next_refresh - time.monotonic(), 0))
+                # Let the rest of a burst arrive before reading
+                await asyncio.sleep(self.coalesce)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            refresh = time.monotonic() >= next_refresh
+            if refresh:
+                next_refresh = time.monotonic() + self.refresh_seconds
+            try:
+                await self.flush(db, refresh=refresh)
+            except PyMongoError as e:
+                logger.error(f"Pool feed read failed: {e}")
+
+    async def stream(self, db, subscription: Subscription):
+        """SSE body for one connection: a snapshot of the subscribed products, then live updates."""
+        self._register(subscription)
+        try:
+            yield f"retry: {HEARTBEAT_SECONDS * 1000}\n\n"
+            if subscription.products:
+                for pool in await self._read(db, sorted(subscription.products)):
+                    self._last.setdefault(pool["id"], _pool_state(pool))
+                    self._sequence += 1
+                    yield sse_event("pool", pool, self._sequence)
+            while True:
+                batch = await subscription.next_batch(HEARTBEAT_SECONDS)
+                if subscription.overflowed:
+                    yield sse_event("resync", {"reason": "client too slow"})
+                    return
+                if not batch:
+                    yield ": ping\n\n"
+                for pool in batch:
+                    self._sequence += 1
+                    yield sse_event("pool", pool, self._sequence)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscribers,
+            "products": len(self._by_product),
+            "categories": len(self._by_category),
+            "reads": self.reads,
+            "events": self.events,
+            "overflows": self.overflows,
+        }
+
+
+POOL_FEED_METRICS = {
+    "subscribers": Gauge("kivu_pool_feed_subscribers", "Open pool progress streams."),
+    "reads": Counter("kivu_pool_feed_reads_total", "Mongo reads made to fan out pool updates."),
+    "events": Counter("kivu_pool_feed_events_total", "Pool updates queued to streams."),
+    "overflows": Counter("kivu_pool_feed_overflows_total", "Streams closed for falling too far behind."),
+}
+
+
+def pool_feed_collector(feed: PoolBroadcaster) -> Callable[[], List[str]]:
+    """COLLECTORS entry for /api/metrics."""
+    return stats_collector(POOL_FEED_METRICS, lambda: [((), feed.stats())])
+
+
+pool_feed = PoolBroadcaster(
+    coalesce_ms=float(os.environ.get('POOL_FEED_COALESCE_MS', 250)),
+    max_subscribers=int(os.environ.get('POOL_FEED_MAX_SUBSCRIBERS', 10000)),
+    max_pending=int(os.environ.get('POOL_FEED_MAX_PENDING', 256)),
+    refresh_seconds=float(os.environ.get('POOL_FEED_REFRESH_SECONDS', 5)),
+)
@@ -0,0 +1,84 @@
+from datetime import datetime
+from typing import Optional, List, Tuple
+
+from pymongo import ReturnDocument
+
+
+POOL_PROJECTION = {"_id": 0, "id": 1, "poolCurrent": 1, "poolSize": 1, "poolStatus": 1}
+
+
+async def reserve_pool_slots(db, product_id: str, quantity: int, session=None) -> Optional[dict]:
+    """
+    Atomically take `quantity` slots in a product's pool.
+
+    The update only applies when poolCurrent + quantity <= poolSize, evaluated by Mongo
+    on the document itself, so concurrent orders can never push a pool past its size.
+    Returns the updated pool fields, or None if the product is missing, not approved,
+    closed, or has fewer than `quantity` free slots.
+
+    poolStatus is derived from the new poolCurrent in the same update pipeline, so the
+    reservation that fills the pool is the one that closes it, and no write in between
+    (such as a release of another order's slots) can leave a pool closed with free slots.
+    """
+    if quantity <= 0:
+        return None
+    full = {"$gte": ["$poolCurrent", "$poolSize"]}
+    pool = await db.seller_products.find_one_and_update(
+        {
+            "id": product_id,
+            "status": "approved",
+            "poolStatus": {"$ne": "closed"},
+            "$expr": {"$lte": [{"$add": ["$poolCurrent", quantity]}, "$poolSize"]},
+        },
+        [
+            {"$set": {"poolCurrent": {"$add": ["$poolCurrent", quantity]}}},
+            {"$set": {
+                "poolStatus": {"$cond": [full, "closed", "open"]},
+                # Left unset ("$poolClosedAt" is missing) until the pool fills
+                "poolClosedAt": {"$cond": [full, datetime.utcnow(), "$poolClosedAt"]},
+            }},
+        ],
+        projection=POOL_PROJECTION,
+        # The pre-image plus our own increment is exactly the post-image of this update
+        return_document=ReturnDocument.BEFORE,
+        session=session,
+    )
+    if pool is None:
+        return None
+    pool["poolCurrent"] += quantity
+    pool["poolStatus"] = "closed" if pool["poolCurrent"] >= pool["poolSize"] else "open"
+    return pool
+
+
+async def release_pool_slots(db, product_id: str, quantity: int, session=None) -> bool:
+    """Give back previously reserved slots (e.g. when the order that took them is not created)."""
+    result = await db.seller_products.update_one(
+        {"id": product_id, "poolCurrent": {"$gte": quantity}},
+        {"$inc": {"poolCurrent": -quantity}, "$set": {"poolStatus": "open"}, "$unset": {"poolClosedAt": ""}},
+        session=session,
+    )
+    return result.modified_count == 1
+
+
+async def reserve_order_pools(db, items: List[dict], session=None) -> Tuple[List[Tuple[str, int]], Optional[str]]:
+    """
+    Reserve pool slots for every pool line item of an order, all or nothing.
+
+    Returns (reserved, failed_product_id). On failure the slots taken so far have
+    already been released and `reserved` is empty.
+    """
+    reserved: List[Tuple[str, int]] = []
+    for item in items:
+        if not item.get("is_pool_purchase"):
+            continue
+        product_id, quantity = item["product_id"], item["quantity"]
+        if await reserve_pool_slots(db, product_id, quantity, session=session) is None:
+            await release_reservations(db, reserved, session=session)
+            return [], product_id
+        reserved.append((product_id, quantity))
+    return reserved, None
+
+
+async def release_reservations(db, reserved: List[Tuple[str, int]], session=None):
+    for product_id, quantity in reserved:
+        await release_pool_slots(db, product_id, quantity, session=session)
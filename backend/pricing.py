@@ -0,0 +1,74 @@
+from typing import Dict, Iterable, List
+
+
+# Product fields needed to show and price a cart / order line
+LINE_PRODUCT_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "seller_id": 1,
+    "name": 1,
+    "nameRw": 1,
+    "image": 1,
+    "category": 1,
+    "regularPrice": 1,
+    "perItemPrice": 1,
+    "poolPrice": 1,
+    "poolSize": 1,
+    "poolCurrent": 1,
+    "poolStatus": 1,
+    "status": 1,
+}
+
+
+async def load_products(db, product_ids: Iterable[str], projection: dict = LINE_PRODUCT_PROJECTION) -> Dict[str, dict]:
+    """Fetch every referenced product with a single $in query, keyed by product id."""
+    ids = list(dict.fromkeys(product_ids))
+    if not ids:
+        return {}
+    docs = await db.seller_products.find({"id": {"$in": ids}}, projection).to_list(length=len(ids))
+    return {doc["id"]: doc for doc in docs}
+
+
+def unit_price(product: dict, is_pool_purchase: bool) -> float:
+    return product["poolPrice"] if is_pool_purchase else product["perItemPrice"]
+
+
+def price_items(items: List[dict], products: Dict[str, dict]) -> dict:
+    """
+    Attach product data and prices to cart/order line items and compute totals.
+    Lines whose product no longer exists are kept (available=False) but not charged.
+    Uses "subtotal" rather than "total_amount" so it can sit next to an order's charged total.
+    """
+    lines = []
+    total = 0.0
+    regular_total = 0.0
+    item_count = 0
+    for item in items:
+        product = products.get(item["product_id"])
+        line = {**item, "product": product, "available": product is not None}
+        if product is not None:
+            # Order lines keep the price they were bought at; cart lines use the current price
+            price = item.get("unit_price")
+            if price is None:
+                price = unit_price(product, item.get("is_pool_purchase", False))
+            line["unit_price"] = price
+            line["line_total"] = round(price * item["quantity"], 2)
+            total += price * item["quantity"]
+            regular_total += product["regularPrice"] * item["quantity"]
+            item_count += item["quantity"]
+        else:
+            line["unit_price"] = None
+            line["line_total"] = 0.0
+        lines.append(line)
+    return {
+        "items": lines,
+        "item_count": item_count,
+        "subtotal": round(total, 2),
+        "regular_total": round(regular_total, 2),
+        "savings": round(regular_total - total, 2),
+    }
+
+
+async def expand_items(db, items: List[dict]) -> dict:
+    products = await load_products(db, (item["product_id"] for item in items))
+    return price_items(items, products)
@@ -0,0 +1,58 @@
+import os
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from cache import TTLCache
+
+
+# User documents keyed by user id. Entries are short-lived and dropped explicitly
+# whenever a user's role changes, so authorization never trusts a stale role for long.
+user_cache = TTLCache(
+    maxsize=int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('PRINCIPAL_CACHE_TTL', 60)),
+)
+
+
+async def get_cached_user(db, user_id: str) -> Optional[dict]:
+    user_doc = user_cache.get(user_id)
+    if user_doc is None:
+        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
+        if user_doc:
+            user_cache.set(user_id, user_doc)
+    return user_doc
+
+
+def invalidate_user(user_id: str):
+    user_cache.pop(user_id)
+
+
+def claims_allow(claims: dict, account_type: str) -> bool:
+    """False when the token itself says the user has a different role, so the lookup can be skipped."""
+    claimed_type = claims.get('account_type')
+    return claimed_type is None or claimed_type == account_type
+
+
+async def resolve_principal(db, claims: dict) -> Optional[dict]:
+    """
+    Return the (cached) user document behind a decoded token, or None if the user is gone.
+
+    The document is authoritative for the role: its token_version must match the
+    token's "ver" claim, which is how a role change revokes previously issued tokens.
+    Tokens issued before claims carried a role have no "ver" and skip that check.
+
+    invalidate_user() only clears this process's cache, so a token newer than the cached
+    document means the role changed through another server process; the document is
+    re-read before the token is rejected.
+    """
+    user_doc = await get_cached_user(db, claims['sub'])
+    if user_doc and 'ver' in claims and claims['ver'] > user_doc.get('token_version', 0):
+        invalidate_user(claims['sub'])
+        user_doc = await get_cached_user(db, claims['sub'])
+    if user_doc and 'ver' in claims and claims['ver'] != user_doc.get('token_version', 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Could not validate credentials',
+            headers={'WWW-Authenticate': 'Bearer'},
+        )
+    return user_doc
@@ -0,0 +1,57 @@
+import os
+from typing import List, Optional
+
+from cache import LoadingCache
+from metrics import Counter, Gauge, stats_collector
+
+
+# Single products by id. Misses are cached as None too, so repeated requests for an
+# unknown id don't reach Mongo either; creation invalidates the id explicitly.
+product_cache = LoadingCache(
+    maxsize=int(os.environ.get('PRODUCT_CACHE_SIZE', 5000)),
+    ttl=float(os.environ.get('PRODUCT_CACHE_TTL', 300)),
+)
+
+# Public catalog pages (approved listing and /catalog/products), keyed by their query parameters
+page_cache = LoadingCache(
+    maxsize=int(os.environ.get('PAGE_CACHE_SIZE', 1000)),
+    ttl=float(os.environ.get('PAGE_CACHE_TTL', 60)),
+)
+
+
+def invalidate_product(product_id: str, listing_changed: bool = False):
+    """
+    Drop the cached product. Pages are only dropped when the product entered or left
+    the approved listing, since only then do page memberships and offsets shift.
+    """
+    product_cache.pop(product_id)
+    if listing_changed:
+        page_cache.clear()
+
+
+def invalidate_products(product_ids: Optional[List[str]], listing_changed: bool = False):
+    """Bulk variant of invalidate_product; None means the affected ids are unknown, so every product is dropped."""
+    if product_ids is None:
+        product_cache.clear()
+    else:
+        for product_id in product_ids:
+            product_cache.pop(product_id)
+    if listing_changed:
+        page_cache.clear()
+
+
+def cache_stats() -> dict:
+    return {"products": product_cache.stats(), "pages": page_cache.stats()}
+
+
+CACHE_METRICS = {
+    **{
+        field: Counter(f"kivu_cache_{field}_total", f"Cache {field} by cache.", ("cache",))
+        for field in ("hits", "misses", "loads", "coalesced", "invalidations")
+    },
+    "size": Gauge("kivu_cache_size", "Cache entries by cache.", ("cache",)),
+}
+
+# COLLECTORS entry for /api/metrics
+cache_collector = stats_collector(CACHE_METRICS, lambda: (((cache,), stats) for cache, stats in cache_stats().items()))
+
@@ -0,0 +1,150 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, List, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from catalog_stats import record_products_added
+from models import SellerProduct, SellerProductCreate
+
+
+IMPORT_BATCH_SIZE = 1000
+# Only the first errors are reported row by row; the counts always cover the whole file
+MAX_REPORTED_ERRORS = 1000
+# Guards against an unterminated CSV quote swallowing the rest of the upload
+MAX_RECORD_CHARS = 1_000_000
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed UTF-8 body into lines without holding more than one chunk."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(buffer) > MAX_RECORD_CHARS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Import line too long")
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield buffer.rstrip("\r")
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON: {e}")
+
+
+def _csv_row(row: dict) -> dict:
+    images = (row.get("images") or "").strip()
+    if images.startswith("["):
+        row["images"] = json.loads(images)
+    else:
+        row["images"] = [image for image in images.split("|") if image]
+    return row
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    CSV with a header row. A quoted field may span lines: a record is complete once it
+    holds an even number of quote characters (escaped quotes are doubled, so parity holds).
+    `images` may be a JSON array or a '|'-separated list.
+    """
+    header = None
+    pending = None
+    row_number = 0
+    async for line in lines:
+        record = line if pending is None else pending + "\n" + line
+        if record.count('"') % 2:
+            if len(record) > MAX_RECORD_CHARS:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unterminated quoted CSV field")
+            pending = record
+            continue
+        pending = None
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        try:
+            yield row_number, _csv_row(dict(zip(header, values)))
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid images value: {e}")
+
+
+class ImportReport:
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def error(self, row: int, messages: List[str]):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": messages})
+
+    def dict(self) -> dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def _insert_batch(db, batch: List[Tuple[int, dict]], report: ImportReport):
+    failed = set()
+    try:
+        result = await db.seller_products.insert_many([doc for _, doc in batch], ordered=False)
+        report.inserted += len(result.inserted_ids)
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        report.inserted += e.details.get("nInserted", len(batch) - len(write_errors))
+        for write_error in write_errors:
+            failed.add(write_error["index"])
+            report.error(batch[write_error["index"]][0], [write_error.get("errmsg", "Write failed")])
+    # Unordered: every row without a write error was inserted
+    await record_products_added(db, (doc for index, (_, doc) in enumerate(batch) if index not in failed))
+
+
+async def import_seller_products(db, seller_id: str, rows: AsyncIterator[Tuple[int, object]]) -> dict:
+    """Validate rows against SellerProductCreate as they arrive, insert them in unordered batches and count them into catalog_stats."""
+    report = ImportReport()
+    batch: List[Tuple[int, dict]] = []
+    async for row_number, row in rows:
+        report.received += 1
+        if isinstance(row, Exception):
+            report.error(row_number, [str(row)])
+            continue
+        if not isinstance(row, dict):
+            report.error(row_number, ["Row must be an object"])
+            continue
+        try:
+            product_data = SellerProductCreate(**row)
+        except ValidationError as e:
+            report.error(row_number, [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()])
+            continue
+        # Как и в create_seller_product: товар попадает на модерацию со статусом 'pending'
+        product = SellerProduct(seller_id=seller_id, **product_data.dict())
+        batch.append((row_number, product.dict()))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await _insert_batch(db, batch, report)
+            batch = []
+    if batch:
+        await _insert_batch(db, batch, report)
+    return report.dict()
@@ -0,0 +1,54 @@
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from models import SellerProduct
+from moderation import LEASE_FIELDS
+
+
+PRODUCT_FIELDS = tuple(SellerProduct.model_fields)
+
+# Full product documents for sellers and the public: the moderation lease (who is
+# reviewing it and until when) is stored on the product but only shown to admins
+PRODUCT_READ_PROJECTION = {"_id": 0, **{field: 0 for field in LEASE_FIELDS}}
+
+# Text fields belonging to each language; a lang= request drops the other language's fields
+LANGUAGE_FIELDS = {
+    "en": ("name", "description"),
+    "rw": ("nameRw", "descriptionRw"),
+}
+
+
+def product_projection(lang: Optional[str] = None, fields: Optional[str] = None) -> Optional[dict]:
+    """
+    Turn the lang= and fields= query parameters into a Mongo projection.
+    Returns None when the full document was requested (neither parameter given).
+    """
+    if not lang and not fields:
+        return None
+
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = sorted(set(selected) - set(PRODUCT_FIELDS))
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown product fields: {', '.join(unknown)}"
+            )
+    else:
+        selected = list(PRODUCT_FIELDS)
+
+    if lang:
+        other_language = {field for code, names in LANGUAGE_FIELDS.items() if code != lang for field in names}
+        selected = [name for name in selected if name not in other_language]
+
+    projection = {"_id": 0, "id": 1}
+    projection.update({name: 1 for name in selected})
+    return projection
+
+
+def project_document(doc: dict, projection: Optional[dict]) -> dict:
+    """Apply a product_projection() to a document that was already loaded in full (e.g. from the cache)."""
+    if projection is None:
+        return doc
+    return {key: value for key, value in doc.items() if projection.get(key)}
@@ -0,0 +1,301 @@
+"""
+In-process typeahead index over approved products (GET /api/search/suggest).
+
+Tokens from name/nameRw (and, weighted lower, description/descriptionRw) are lowercased
+and stripped of accents. Lookups work like this:
+  - every query token but the last must match a token exactly or within one edit
+    (insert, delete, substitute or swap of adjacent letters). Fuzzy candidates come
+    from a deletion index (SymSpell), so there is no scan over the vocabulary;
+  - the last token is what the user is typing, so it matches as a prefix (bisect over
+    the sorted vocabulary) as well as fuzzily;
+  - products must match every query token. They are ranked by text score times a
+    popularity boost from rating and pool progress.
+
+The index is built at startup from one projected query and kept current by the
+create / approve / reject / bulk-moderate handlers in server.py.
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo.errors import PyMongoError
+
+from cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = {"name": 1.0, "nameRw": 1.0, "description": 0.3, "descriptionRw": 0.3}
+SUGGEST_FIELDS = ["id", "name", "nameRw", "image", "category", "poolPrice", "rating", "poolCurrent", "poolSize"]
+INDEX_PROJECTION = {"_id": 0, **{field: 1 for field in set(SUGGEST_FIELDS) | set(FIELD_WEIGHTS)}}
+
+EXACT, PREFIX, FUZZY = 1.0, 0.8, 0.5
+MIN_FUZZY_LENGTH = 4  # "tv" -> "to" is not a typo worth correcting
+MAX_PREFIX_EXPANSIONS = 64
+BUILD_CHUNK = 1000
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(normalize(text)) if text else []
+
+
+def _deletes(token: str) -> Set[str]:
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Optimal string alignment distance <= 1."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    return any(a == b[:i] + b[i + 1:] for i in range(len(b)))
+
+
+def popularity(product: dict) -> float:
+    """Ranking boost in [1, 2]: half from rating, half from how full the pool is."""
+    rating = min(max(product.get("rating") or 0, 0), 5) / 5
+    pool_size = product.get("poolSize") or 0
+    progress = min((product.get("poolCurrent") or 0) / pool_size, 1) if pool_size else 0
+    return 1 + 0.5 * rating + 0.5 * progress
+
+
+class SearchIndex:
+    def __init__(self):
+        self.products: Dict[str, dict] = {}
+        self._boost: Dict[str, float] = {}
+        self._product_tokens: Dict[str, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._variants: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self.products)
+
+    def _add_token(self, token: str):
+        bisect.insort(self._vocabulary, token)
+        if len(token) >= MIN_FUZZY_LENGTH:
+            for variant in _deletes(token):
+                self._variants.setdefault(variant, set()).add(token)
+
+    def _drop_token(self, token: str):
+        index = bisect.bisect_left(self._vocabulary, token)
+        if index < len(self._vocabulary) and self._vocabulary[index] == token:
+            del self._vocabulary[index]
+        if len(token) >= MIN_FUZZY_LENGTH:
+            for variant in _deletes(token):
+                tokens = self._variants.get(variant)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._variants[variant]
+
+    def upsert(self, product: dict):
+        self.remove(product["id"])
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(product.get(field)):
+                weights[token] = max(weights.get(token, 0), weight)
+        product_id = product["id"]
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._add_token(token)
+            postings[product_id] = weight
+        self._product_tokens[product_id] = weights
+        self.products[product_id] = {field: product.get(field) for field in SUGGEST_FIELDS}
+        self._boost[product_id] = popularity(product)
+
+    def remove(self, product_id: str):
+        weights = self._product_tokens.pop(product_id, None)
+        if weights is None:
+            return
+        for token in weights:
+            postings = self._postings[token]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                self._drop_token(token)
+        del self.products[product_id]
+        del self._boost[product_id]
+
+    def adjust_pool(self, product_id: str, quantity: int):
+        product = self.products.get(product_id)
+        if product is not None:
+            product["poolCurrent"] = (product.get("poolCurrent") or 0) + quantity
+            self._boost[product_id] = popularity(product)
+
+    def _fuzzy(self, token: str) -> Set[str]:
+        if len(token) < MIN_FUZZY_LENGTH:
+            return set()
+        candidates = set(self._variants.get(token, ()))
+        for variant in _deletes(token):
+            if variant in self._postings:
+                candidates.add(variant)
+            candidates.update(self._variants.get(variant, ()))
+        return {candidate for candidate in candidates if candidate != token and _within_one_edit(token, candidate)}
+
+    def _prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        matches = []
+        for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+        return matches
+
+    def _match(self, token: str, is_prefix: bool) -> Dict[str, float]:
+        """product id -> best score for one query token."""
+        expansions: List[Tuple[str, float]] = []
+        if token in self._postings:
+            expansions.append((token, EXACT))
+        if is_prefix:
+            expansions += [(match, PREFIX) for match in self._prefix(token) if match != token]
+        expansions += [(match, FUZZY) for match in self._fuzzy(token)]
+        scores: Dict[str, float] = {}
+        for match, quality in expansions:
+            for product_id, weight in self._postings[match].items():
+                score = quality * weight
+                if score > scores.get(product_id, 0):
+                    scores[product_id] = score
+        return scores
+
+    def suggest(self, query: str, limit: int = 8) -> List[dict]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # The last token is only a prefix if the user is still typing it
+        last_is_prefix = not query[-1:].isspace()
+        per_token = [self._match(token, last_is_prefix and i == len(tokens) - 1) for i, token in enumerate(tokens)]
+        per_token.sort(key=len)
+        if not per_token[0]:
+            return []
+        totals = dict(per_token[0])
+        for scores in per_token[1:]:
+            totals = {product_id: total + scores[product_id] for product_id, total in totals.items() if product_id in scores}
+            if not totals:
+                return []
+        best = heapq.nlargest(limit, totals.items(), key=lambda item: item[1] * self._boost[item[0]])
+        return [{**self.products[product_id], "score": round(score * self._boost[product_id], 4)} for product_id, score in best]
+
+
+class SearchService:
+    """
+    The live index plus the rebuild that replaces it. Writes that land while a rebuild
+    is loading go to both indexes, and the loader skips the ids they touched, so the
+    swapped-in index never holds an older version of a product than the live one.
+    """
+
+    def __init__(self, cache_size: int = 5000, cache_ttl: float = 30.0):
+        self.index = SearchIndex()
+        self.ready = False
+        self._building: Optional[SearchIndex] = None
+        self._touched: Set[str] = set()
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._rebuild_again = False
+        # Typeahead repeats the same prefixes; results are cached until the product set changes
+        self._results = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def _indexes(self) -> Iterable[SearchIndex]:
+        return (self.index, self._building) if self._building is not None else (self.index,)
+
+    def product_changed(self, product: dict):
+        """Call with the product's current document after any create or status change."""
+        self._touched.add(product["id"])
+        for index in self._indexes():
+            if product.get("status") == "approved":
+                index.upsert(product)
+            else:
+                index.remove(product["id"])
+        self._results.clear()
+
+    def product_removed(self, product_id: str):
+        self._touched.add(product_id)
+        for index in self._indexes():
+            index.remove(product_id)
+        self._results.clear()
+
+    def pool_changed(self, product_id: str, quantity: int):
+        # Ranking only: cached results may keep the old order until they expire
+        for index in self._indexes():
+            index.adjust_pool(product_id, quantity)
+
+    def suggest(self, query: str, limit: int = 8) -> List[dict]:
+        key = (normalize(query).lstrip(), limit)
+        results = self._results.get(key)
+        if results is None:
+            results = self.index.suggest(query, limit)
+            self._results.set(key, results)
+        return results
+
+    def schedule_rebuild(self, db) -> asyncio.Task:
+        """
+        Rebuild in the background. A request that arrives while a rebuild is running
+        queues one more after it, since the running load may already have passed the
+        products that changed; any number of such requests share that follow-up.
+        """
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            self._rebuild_again = True
+            return self._rebuild_task
+
+        async def rebuild():
+            while True:
+                self._rebuild_again = False
+                try:
+                    await self.rebuild(db)
+                except PyMongoError as e:
+                    logger.error(f"Search index rebuild failed: {e}")
+                if not self._rebuild_again:
+                    return
+
+        self._rebuild_task = asyncio.create_task(rebuild())
+        return self._rebuild_task
+
+    async def rebuild(self, db):
+        if self._building is not None:
+            return
+        building = self._building = SearchIndex()
+        self._touched = set()
+        try:
+            cursor = db.seller_products.find({"status": "approved"}, INDEX_PROJECTION).batch_size(BUILD_CHUNK)
+            loaded = 0
+            async for product in cursor:
+                if product["id"] not in self._touched:
+                    building.upsert(product)
+                loaded += 1
+                if loaded % BUILD_CHUNK == 0:
+                    await asyncio.sleep(0)  # Indexing is CPU work; let requests in between chunks
+            self.index = building
+            self.ready = True
+            self._results.clear()
+            logger.info(f"Search index built: {len(building)} products, {len(building._vocabulary)} tokens")
+        finally:
+            self._building = None
+            self._touched = set()
+
+
+search_service = SearchService(
+    cache_size=int(os.environ.get('SEARCH_CACHE_SIZE', 5000)),
+    cache_ttl=float(os.environ.get('SEARCH_CACHE_TTL', 30)),
+)
@@ -0,0 +1,35 @@
+import json
+from datetime import datetime, date
+from typing import Any
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt, stdlib json is only a fallback
+    orjson = None
+
+
+# Documents read from our own collections were validated by the models when they were written,
+# so list endpoints can encode them directly instead of rebuilding and re-validating every model.
+# Reads must project out "_id" (ObjectId is not JSON-serializable).
+TRUSTED_PROJECTION = {"_id": 0}
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class TrustedJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
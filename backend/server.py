@@ -1,15 +1,39 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Literal
 from datetime import datetime
 
-from models import User, UserCreate, UserLogin, UserResponse, Token, Cart, CartItem, Order, OrderCreate, SellerProduct, SellerProductCreate
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
+from models import User, UserCreate, UserLogin, UserResponse, Token, AccountTypeUpdate, Cart, CartItem, CartItemDelta, CartPatch, Order, OrderCreate, SellerProduct, SellerProductCreate, CatalogPage, CatalogStats, SearchSuggestion, SellerAnalytics, BulkModerationRequest, BulkModerationResult, ModerationRelease
+from auth import create_user_access_token, get_current_user, get_token_claims
+from catalog import build_catalog_filters, fetch_catalog_page
+from catalog_stats import record_product_added, record_status_change, record_status_changes, rebuild_catalog_stats, schedule_rebuild, ensure_catalog_stats, read_catalog_stats
+from pagination import fetch_page, keyset_query, NEXT_CURSOR_HEADER
+from indexes import bootstrap_indexes
+from carts import apply_cart_deltas, remove_cart_item, get_cart_document, run_cart_sweeper
+from hashing import hasher_from_env, hasher_collector
+from principals import resolve_principal, claims_allow, invalidate_user
+from product_cache import product_cache, page_cache, invalidate_product, invalidate_products, cache_stats, cache_collector
+from projections import product_projection, project_document, PRODUCT_READ_PROJECTION
+from serialization import TrustedJSONResponse, TRUSTED_PROJECTION
+from orders import place_order
+from exports import export_query, stream_export, ORDER_EXPORT_FIELDS, PRODUCT_EXPORT_FIELDS, MEDIA_TYPES
+from product_import import iter_lines, iter_ndjson_rows, iter_csv_rows, import_seller_products
+from pricing import expand_items
+from search import search_service, INDEX_PROJECTION
+from analytics import seller_report
+from pool_feed import pool_feed, pool_feed_collector, SSE_HEADERS
+from moderation import bulk_moderate, claim_pending, release_leases, listing_changed, ACTION_STATUS, LEASE_FIELDS
+from admission import AdmissionMiddleware, gates_from_env, admission_collector
+from metrics import MetricsMiddleware, command_timer, render_metrics, COLLECTORS, CONTENT_TYPE
 
 
 ROOT_DIR = Path(__file__).parent
@@ -17,9 +41,23 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# command_timer feeds the per-collection Mongo latency histograms served at /api/metrics
+client = AsyncIOMotorClient(mongo_url, event_listeners=[command_timer])
 db = client[os.environ['DB_NAME']]
 
+# bcrypt runs on a bounded worker pool (PASSWORD_HASH_WORKERS / PASSWORD_HASH_QUEUE / PASSWORD_HASH_EXECUTOR)
+password_hasher = hasher_from_env()
+
+# Concurrency limits per route group (ADMISSION_<GROUP>_LIMIT / _QUEUE, see admission.py)
+admission_gates = gates_from_env()
+
+COLLECTORS.extend([
+    cache_collector,
+    hasher_collector(password_hasher),
+    admission_collector(admission_gates),
+    pool_feed_collector(pool_feed),
+])
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -27,6 +65,17 @@ app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    # List endpoints keep returning plain arrays; the keyset cursor for the next page travels in a header
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+def trusted_response(content, response: Response) -> TrustedJSONResponse:
+    # Documents from our own collections are encoded as-is: no second pass through response_model.
+    # This is also what lets partial product documents (lang= / fields=) through.
+    return TrustedJSONResponse(content, headers=dict(response.headers))
+
+
 # Authentication Routes
 @api_router.post("/auth/register", response_model=Token)
 async def register(user_data: UserCreate):
@@ -42,14 +91,21 @@ async def register(user_data: UserCreate):
     user = User(
         email=user_data.email,
         name=user_data.name,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await password_hasher.hash(user_data.password),
         account_type=user_data.account_type
     )
     
-    await db.users.insert_one(user.dict())
+    try:
+        await db.users.insert_one(user.dict())
+    except DuplicateKeyError:
+        # Параллельная регистрация с тем же email прошла проверку выше; её отсекает индекс email_unique
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
     # Create access token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_user_access_token(user.id, user.account_type, user.token_version)
     
     user_response = UserResponse(
         id=user.id,
@@ -74,14 +130,14 @@ async def login(credentials: UserLogin):
     user = User(**user_doc)
     
     # Verify password
-    if not verify_password(credentials.password, user.password_hash):
+    if not await password_hasher.verify(credentials.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
     # Create access token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_user_access_token(user.id, user.account_type, user.token_version)
     
     user_response = UserResponse(
         id=user.id,
@@ -94,8 +150,8 @@ async def login(credentials: UserLogin):
     return Token(access_token=access_token, token_type="bearer", user=user_response)
 
 @api_router.get("/auth/me", response_model=UserResponse)
-async def get_me(user_id: str = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"id": user_id})
+async def get_me(claims: dict = Depends(get_token_claims)):
+    user_doc = await resolve_principal(db, claims)
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -111,76 +167,30 @@ async def get_me(user_id: str = Depends(get_current_user)):
 
 # Cart Routes
 @api_router.get("/cart")
-async def get_cart(user_id: str = Depends(get_current_user)):
-    cart_doc = await db.carts.find_one({"user_id": user_id})
-    if not cart_doc:
-        # Create empty cart
-        cart = Cart(user_id=user_id)
-        await db.carts.insert_one(cart.dict())
-        return cart
-    return Cart(**cart_doc)
+async def get_cart(expand: Optional[Literal["products"]] = None, user_id: str = Depends(get_current_user)):
+    # Корзина создаётся только первой мутацией (upsert в carts.py); чтение ничего не пишет
+    cart = Cart(**await get_cart_document(db, user_id))
+    if expand == "products":
+        # Товары корзины с ценами и итогами — одним запросом $in вместо запроса на каждый товар
+        cart_data = cart.dict()
+        return TrustedJSONResponse({**cart_data, **await expand_items(db, cart_data["items"])})
+    return cart
 
 @api_router.post("/cart/add")
 async def add_to_cart(item: CartItem, user_id: str = Depends(get_current_user)):
-    cart_doc = await db.carts.find_one({"user_id": user_id})
-    
-    if not cart_doc:
-        cart = Cart(user_id=user_id, items=[item.dict()])
-        await db.carts.insert_one(cart.dict())
-    else:
-        cart = Cart(**cart_doc)
-        # Check if item already exists
-        item_exists = False
-        for i, existing_item in enumerate(cart.items):
-            if existing_item.get('product_id') == item.product_id and existing_item.get('is_pool_purchase') == item.is_pool_purchase:
-                cart.items[i]['quantity'] += item.quantity
-                item_exists = True
-                break
-        
-        if not item_exists:
-            cart.items.append(item.dict())
-        
-        cart.updated_at = datetime.utcnow()
-        await db.carts.update_one(
-            {"user_id": user_id},
-            {"$set": cart.dict()}
-        )
-    
+    await apply_cart_deltas(db, user_id, [CartItemDelta(**item.dict())])
     return {"message": "Item added to cart"}
 
+@api_router.patch("/cart")
+async def patch_cart(patch: CartPatch, user_id: str = Depends(get_current_user)):
+    # Несколько изменений количества за один запрос и одну операцию bulk_write
+    await apply_cart_deltas(db, user_id, patch.items)
+    return {"message": "Cart updated"}
+
 @api_router.delete("/cart/remove/{product_id}")
 async def remove_from_cart(product_id: str, is_pool_purchase: bool = False, user_id: str = Depends(get_current_user)):
-    cart_doc = await db.carts.find_one({"user_id": user_id})
-    if not cart_doc:
+    if not await remove_cart_item(db, user_id, product_id, is_pool_purchase):
         raise HTTPException(status_code=404, detail="Cart not found")
-
-    cart = Cart(**cart_doc)
-
-    # Новая, более точная логика удаления:
-    # Мы ищем точный товар (по ID и типу покупки) и удаляем его.
-    # Это предотвращает случайное удаление "обычного" товара, если удалялся "pool"
-    item_found = False
-    new_items = []
-    for item in cart.items:
-        if item.get('product_id') == product_id and item.get('is_pool_purchase') == is_pool_purchase and not item_found:
-            item_found = True  # Нашли и "пропускаем" (т.е. не добавляем в new_items)
-        else:
-            new_items.append(item)
-
-    if not item_found:
-        # Если вы хотите быть строгим, вы можете раскомментировать это
-        # raise HTTPException(status_code=404, detail="Item not found in cart with specified type")
-        # Но пока мы просто обновим корзину (даже если ничего не изменилось)
-        pass
-
-    cart.items = new_items
-    cart.updated_at = datetime.utcnow()
-
-    await db.carts.update_one(
-        {"user_id": user_id},
-        {"$set": {"items": [item.dict() for item in cart.items], "updated_at": cart.updated_at}}
-    )
-
     return {"message": "Item removed from cart"}
 
 @api_router.delete("/cart/clear")
@@ -194,44 +204,49 @@ async def clear_cart(user_id: str = Depends(get_current_user)):
 
 # Order Routes
 @api_router.post("/orders", response_model=Order)
-async def create_order(order_data: OrderCreate, user_id: str = Depends(get_current_user)):
-    order = Order(
-        user_id=user_id,
-        items=[item.dict() for item in order_data.items],
-        total_amount=order_data.total_amount
-    )
-    
-    await db.orders.insert_one(order.dict())
-    
-    # Clear cart after order
-    await db.carts.update_one(
-        {"user_id": user_id},
-        {"$set": {"items": [], "updated_at": datetime.utcnow()}}
-    )
-    
-    return order
+async def create_order(
+    order_data: OrderCreate,
+    user_id: str = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    # Сумма считается на сервере; total_amount от клиента игнорируется.
+    # Повтор запроса с тем же Idempotency-Key возвращает уже созданный заказ.
+    order_doc, reserved = await place_order(db, client, user_id, order_data.items, idempotency_key)
+    for product_id, quantity in reserved:
+        # Страницы каталога не сбрасываются: poolCurrent на них обновится по PAGE_CACHE_TTL,
+        # а живой прогресс пула клиенты получают из /api/pools/stream
+        invalidate_product(product_id)
+        search_service.pool_changed(product_id, quantity)
+        pool_feed.pool_changed(product_id)
+    return Order(**order_doc)
 
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders(user_id: str = Depends(get_current_user), skip: int = 0, limit: int = 20):
-    orders_cursor = db.orders.find({"user_id": user_id}).sort("created_at", -1).skip(skip).limit(limit)
-    orders = await orders_cursor.to_list(length=limit)
-    return [Order(**order) for order in orders]
+async def get_orders(response: Response, user_id: str = Depends(get_current_user), cursor: Optional[str] = None, skip: int = 0, limit: int = 20):
+    orders, next_cursor = await fetch_page(db.orders, {"user_id": user_id}, cursor=cursor, skip=skip, limit=limit, projection=TRUSTED_PROJECTION)
+    set_next_cursor(response, next_cursor)
+    return trusted_response(orders, response)
 
 @api_router.get("/orders/{order_id}", response_model=Order)
-async def get_order(order_id: str, user_id: str = Depends(get_current_user)):
-    order_doc = await db.orders.find_one({"id": order_id, "user_id": user_id})
+async def get_order(order_id: str, expand: Optional[Literal["products"]] = None, user_id: str = Depends(get_current_user)):
+    order_doc = await db.orders.find_one({"id": order_id, "user_id": user_id}, TRUSTED_PROJECTION)
     if not order_doc:
         raise HTTPException(status_code=404, detail="Order not found")
+    if expand == "products":
+        return TrustedJSONResponse({**order_doc, **await expand_items(db, order_doc["items"])})
     return Order(**order_doc)
 
 
 # Seller Product Routes
-@api_router.post("/seller/products", response_model=SellerProduct)
-async def create_seller_product(product_data: SellerProductCreate, user_id: str = Depends(get_current_user)):
-    # Check if user is a seller
-    user_doc = await db.users.find_one({"id": user_id})
+async def get_seller_user(claims: dict = Depends(get_token_claims)):
+    # Check if user is a seller (роль из токена и кэшированный документ пользователя)
+    user_doc = await resolve_principal(db, claims) if claims_allow(claims, 'seller') else None
     if not user_doc or user_doc.get('account_type') != 'seller':
         raise HTTPException(status_code=403, detail="Only sellers can create products")
+    return user_doc
+
+@api_router.post("/seller/products", response_model=SellerProduct)
+async def create_seller_product(product_data: SellerProductCreate, seller_user: dict = Depends(get_seller_user)):
+    user_id = seller_user['id']
     
     # --- ИЗМЕНЕНИЕ: Теперь мы передаем ВСЕ поля из product_data ---
     product = SellerProduct(
@@ -253,23 +268,111 @@ async def create_seller_product(product_data: SellerProductCreate, user_id: str
     )
     
     await db.seller_products.insert_one(product.dict())
+    invalidate_product(product.id)
+    await record_product_added(db, product.dict())
+    search_service.product_changed(product.dict())
     return product
 
+@api_router.post("/seller/products/import")
+async def import_seller_products_file(
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = None,
+    seller_user: dict = Depends(get_seller_user),
+):
+    # Тело запроса читается потоком: файл на 100k товаров не загружается в память целиком
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    lines = iter_lines(request.stream())
+    rows = iter_csv_rows(lines) if format == "csv" else iter_ndjson_rows(lines)
+    return await import_seller_products(db, seller_user["id"], rows)
+
 @api_router.get("/seller/products", response_model=List[SellerProduct])
-async def get_seller_products(user_id: str = Depends(get_current_user), skip: int = 0, limit: int = 20):
-    products_cursor = db.seller_products.find({"seller_id": user_id}).sort("created_at", -1).skip(skip).limit(limit)
-    products = await products_cursor.to_list(length=limit)
-    return [SellerProduct(**product) for product in products]
+async def get_seller_products(response: Response, user_id: str = Depends(get_current_user), cursor: Optional[str] = None, skip: int = 0, limit: int = 20):
+    products, next_cursor = await fetch_page(db.seller_products, {"seller_id": user_id}, cursor=cursor, skip=skip, limit=limit, projection=PRODUCT_READ_PROJECTION)
+    set_next_cursor(response, next_cursor)
+    return trusted_response(products, response)
+
+@api_router.get("/seller/analytics", response_model=SellerAnalytics)
+async def get_seller_analytics(
+    days: int = Query(30, ge=1, le=366),
+    top: int = Query(10, ge=1, le=100),
+    seller_user: dict = Depends(get_seller_user),
+):
+    # Считается по дневным агрегатам sales_daily (analytics.py), а не по заказам
+    return await seller_report(db, seller_user["id"], days=days, top=top)
 
 @api_router.get("/seller/products/all", response_model=List[SellerProduct])
-async def get_all_seller_products(skip: int = 0, limit: int = 20):
-    products_cursor = db.seller_products.find({"status": "approved"}).sort("created_at", -1).skip(skip).limit(limit)
-    products = await products_cursor.to_list(length=limit)
-    return [SellerProduct(**product) for product in products]
+async def get_all_seller_products(
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20,
+    lang: Optional[Literal["en", "rw"]] = None,
+    fields: Optional[str] = None,
+):
+    projection = product_projection(lang, fields) or PRODUCT_READ_PROJECTION
+    products, next_cursor = await page_cache.get_or_load(
+        ("approved", cursor, skip, limit, lang, fields),
+        lambda: fetch_page(db.seller_products, {"status": "approved"}, cursor=cursor, skip=skip, limit=limit, projection=projection)
+    )
+    set_next_cursor(response, next_cursor)
+    return trusted_response(products, response)
+
+@api_router.get("/catalog/products", response_model=CatalogPage)
+async def query_catalog(
+    category: Optional[str] = None,
+    price_band: Optional[Literal["all", "under50", "50to100", "over100"]] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    search: Optional[str] = None,
+    sort: Literal["newest", "price_asc", "price_desc", "rating", "popular"] = "newest",
+    skip: int = 0,
+    limit: int = 20,
+    lang: Optional[Literal["en", "rw"]] = None,
+    fields: Optional[str] = None,
+):
+    projection = product_projection(lang, fields) or PRODUCT_READ_PROJECTION
+    base, category_filter, price_filter = build_catalog_filters(
+        category=category,
+        price_band=price_band,
+        min_price=min_price,
+        max_price=max_price,
+        min_rating=min_rating,
+        search=search,
+    )
+
+    def load_catalog_page():
+        return fetch_catalog_page(db.seller_products, base, category_filter, price_filter,
+                                  sort=sort, skip=skip, limit=min(limit, 100), projection=projection)
+
+    cache_key = ("catalog", category, price_band, min_price, max_price, min_rating, search, sort, skip, limit, lang, fields)
+    return TrustedJSONResponse(await page_cache.get_or_load(cache_key, load_catalog_page))
+
+@api_router.get("/catalog/stats", response_model=CatalogStats)
+async def get_catalog_stats():
+    # Читается из материализованной коллекции catalog_stats (несколько документов), без $group по товарам
+    return await read_catalog_stats(db)
+
+@api_router.get("/search/suggest", response_model=List[SearchSuggestion])
+async def search_suggest(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(8, ge=1, le=20)):
+    # Подсказки из индекса в памяти (search.py): без обращения к Mongo
+    return TrustedJSONResponse(search_service.suggest(q, limit))
+
+@api_router.get("/pools/stream")
+async def stream_pools(products: Optional[str] = None, category: Optional[str] = None):
+    # SSE: снимок пулов при подключении, затем изменения poolCurrent/poolStatus (pool_feed.py)
+    product_ids = [product_id for product_id in (products or "").split(",") if product_id]
+    subscription = pool_feed.open(product_ids, [category] if category else [])
+    return StreamingResponse(pool_feed.stream(db, subscription), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @api_router.get("/products/{product_id}", response_model=SellerProduct)
-async def get_product(product_id: str):
-    product_doc = await db.seller_products.find_one({"id": product_id})
+async def get_product(product_id: str, lang: Optional[Literal["en", "rw"]] = None, fields: Optional[str] = None):
+    projection = product_projection(lang, fields)
+    product_doc = await product_cache.get_or_load(
+        product_id,
+        lambda: db.seller_products.find_one({"id": product_id}, PRODUCT_READ_PROJECTION)
+    )
     if not product_doc:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -277,13 +380,17 @@ async def get_product(product_id: str):
     # но в будущем для публичного каталога мы должны проверять:
     # if product_doc.get('status') != 'approved':
     #     raise HTTPException(status_code=403, detail="Product not available")
-            
+
+    # Детальная страница обслуживается из кэша целиком, поэтому поля отбираются здесь, а не в Mongo
+    if projection:
+        return TrustedJSONResponse(project_document(product_doc, projection))
     return SellerProduct(**product_doc)
 
 
 # --- НОВЫЙ КОД: АДМИН-ЭНДПОИНТЫ ---
-async def get_admin_user(user_id: str = Depends(get_current_user)):
-    user_doc = await db.users.find_one({"id": user_id})
+async def get_admin_user(claims: dict = Depends(get_token_claims)):
+    # Токен с другой ролью отклоняется без обращения к базе
+    user_doc = await resolve_principal(db, claims) if claims_allow(claims, 'admin') else None
 
     # ИЗМЕНЕНИЕ: Проверяем поле 'account_type' вместо 'email'
     if not user_doc or user_doc.get('account_type') != 'admin':
@@ -294,39 +401,157 @@ async def get_admin_user(user_id: str = Depends(get_current_user)):
     return user_doc
 
 @api_router.get("/admin/products/all", response_model=List[SellerProduct])
-async def admin_get_all_products(admin_user: dict = Depends(get_admin_user), skip: int = 0, limit: int = 50):
-    products_cursor = db.seller_products.find().sort("created_at", -1).skip(skip).limit(limit)
-    products = await products_cursor.to_list(length=limit)
-    return [SellerProduct(**product) for product in products]
+async def admin_get_all_products(response: Response, admin_user: dict = Depends(get_admin_user), cursor: Optional[str] = None, skip: int = 0, limit: int = 50):
+    products, next_cursor = await fetch_page(db.seller_products, {}, cursor=cursor, skip=skip, limit=limit, projection=TRUSTED_PROJECTION)
+    set_next_cursor(response, next_cursor)
+    return trusted_response(products, response)
 
 @api_router.get("/admin/products/pending", response_model=List[SellerProduct])
-async def admin_get_pending_products(admin_user: dict = Depends(get_admin_user), skip: int = 0, limit: int = 50):
-    products_cursor = db.seller_products.find({"status": "pending"}).sort("created_at", -1).skip(skip).limit(limit)
-    products = await products_cursor.to_list(length=limit)
-    return [SellerProduct(**product) for product in products]
+async def admin_get_pending_products(response: Response, admin_user: dict = Depends(get_admin_user), cursor: Optional[str] = None, skip: int = 0, limit: int = 50):
+    products, next_cursor = await fetch_page(db.seller_products, {"status": "pending"}, cursor=cursor, skip=skip, limit=limit, projection=TRUSTED_PROJECTION)
+    set_next_cursor(response, next_cursor)
+    return trusted_response(products, response)
 
 @api_router.post("/admin/products/approve/{product_id}", response_model=SellerProduct)
 async def admin_approve_product(product_id: str, admin_user: dict = Depends(get_admin_user)):
-    updated_product = await db.seller_products.find_one_and_update(
+    previous = await db.seller_products.find_one_and_update(
         {"id": product_id},
-        {"$set": {"status": "approved"}},
-        return_document=True
+        {"$set": {"status": "approved"}, "$unset": LEASE_FIELDS},
+        return_document=ReturnDocument.BEFORE
     )
-    if not updated_product:
+    if not previous:
         raise HTTPException(status_code=404, detail="Product not found")
-    return SellerProduct(**updated_product)
+    # Каталог меняется только при переходе в статус 'approved' или из него
+    invalidate_product(product_id, listing_changed=previous.get("status") != "approved")
+    await record_status_change(db, previous, "approved")
+    search_service.product_changed({**previous, "status": "approved"})
+    return SellerProduct(**{**previous, "status": "approved"})
 
 @api_router.post("/admin/products/reject/{product_id}", response_model=SellerProduct)
 async def admin_reject_product(product_id: str, admin_user: dict = Depends(get_admin_user)):
-    updated_product = await db.seller_products.find_one_and_update(
+    previous = await db.seller_products.find_one_and_update(
         {"id": product_id},
-        {"$set": {"status": "rejected"}},
-        return_document=True
+        {"$set": {"status": "rejected"}, "$unset": LEASE_FIELDS},
+        return_document=ReturnDocument.BEFORE
     )
-    if not updated_product:
+    if not previous:
         raise HTTPException(status_code=404, detail="Product not found")
-    return SellerProduct(**updated_product)
+    # Каталог меняется только при переходе в статус 'approved' или из него
+    invalidate_product(product_id, listing_changed=previous.get("status") == "approved")
+    await record_status_change(db, previous, "rejected")
+    search_service.product_changed({**previous, "status": "rejected"})
+    return SellerProduct(**{**previous, "status": "rejected"})
+
+async def refresh_search_after_bulk(request: BulkModerationRequest):
+    if request.ids is None:
+        # Затронутые товары неизвестны — индекс перестраивается целиком в фоне
+        search_service.schedule_rebuild(db)
+    elif request.action == "reject":
+        for product_id in request.ids:
+            search_service.product_removed(product_id)
+    else:
+        async for product in db.seller_products.find({"id": {"$in": request.ids}}, {**INDEX_PROJECTION, "status": 1}):
+            search_service.product_changed(product)
+
+@api_router.post("/admin/products/bulk-moderate", response_model=BulkModerationResult)
+async def admin_bulk_moderate(request: BulkModerationRequest, admin_user: dict = Depends(get_admin_user)):
+    matched, modified, moved = await bulk_moderate(db, request.action, request.ids, request.filter)
+    if modified:
+        invalidate_products(
+            request.ids,
+            listing_changed=listing_changed(request.action, request.ids, request.filter, modified)
+        )
+        if moved is not None:
+            await record_status_changes(db, moved, ACTION_STATUS[request.action])
+        else:
+            # Previous statuses are unknown (filter, or a concurrent write), so the stats are recomputed
+            schedule_rebuild(db)
+        await refresh_search_after_bulk(request)
+    return BulkModerationResult(matched=matched, modified=modified)
+
+# Очередь модерации: каждый админ получает свою пачку товаров под временную аренду (lease)
+@api_router.post("/admin/moderation/claim", response_model=List[SellerProduct])
+async def admin_claim_moderation_batch(
+    batch: int = Query(10, ge=1, le=50),
+    lease_seconds: int = Query(300, ge=30, le=3600),
+    admin_user: dict = Depends(get_admin_user),
+):
+    products = await claim_pending(db, admin_user["id"], batch=batch, lease_seconds=lease_seconds)
+    return TrustedJSONResponse(products)
+
+@api_router.post("/admin/moderation/release")
+async def admin_release_moderation_batch(release: ModerationRelease, admin_user: dict = Depends(get_admin_user)):
+    released = await release_leases(db, admin_user["id"], release.ids)
+    return {"released": released}
+
+
+@api_router.post("/admin/users/{user_id}/account-type", response_model=UserResponse)
+async def admin_set_account_type(user_id: str, update: AccountTypeUpdate, admin_user: dict = Depends(get_admin_user)):
+    # Bumping token_version revokes every token issued with the old role
+    user_doc = await db.users.find_one_and_update(
+        {"id": user_id},
+        {"$set": {"account_type": update.account_type}, "$inc": {"token_version": 1}},
+        return_document=True
+    )
+    if not user_doc:
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user_id)
+    return UserResponse(**user_doc)
+
+def export_response(collection, query: dict, fields: List[str], fmt: str, cursor: Optional[str], name: str) -> StreamingResponse:
+    # The resume condition is applied here so a bad cursor fails with 400 before streaming starts
+    query = keyset_query(query, cursor, ascending=True)
+    return StreamingResponse(
+        stream_export(collection, query, fmt, fields),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
 
+@api_router.get("/admin/export/orders")
+async def admin_export_orders(
+    admin_user: dict = Depends(get_admin_user),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    status_filter: Optional[str] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+):
+    query = export_query("order_status", status_filter, created_from, created_to)
+    return export_response(db.orders, query, ORDER_EXPORT_FIELDS, format, cursor, "orders")
+
+@api_router.get("/admin/export/products")
+async def admin_export_products(
+    admin_user: dict = Depends(get_admin_user),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    status_filter: Optional[str] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+):
+    query = export_query("status", status_filter, created_from, created_to)
+    return export_response(db.seller_products, query, PRODUCT_EXPORT_FIELDS, format, cursor, "products")
+
+@api_router.post("/admin/catalog/stats/rebuild", response_model=CatalogStats)
+async def admin_rebuild_catalog_stats(admin_user: dict = Depends(get_admin_user)):
+    await rebuild_catalog_stats(db)
+    return await read_catalog_stats(db)
+
+@api_router.get("/admin/metrics/cache")
+async def admin_cache_stats(admin_user: dict = Depends(get_admin_user)):
+    return cache_stats()
+
+@api_router.get("/admin/metrics/password-hashing")
+async def admin_password_hashing_stats(admin_user: dict = Depends(get_admin_user)):
+    return password_hasher.stats()
+
+
+# Prometheus scrape endpoint. Protected only when METRICS_TOKEN is set
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(authorization: Optional[str] = Header(None)):
+    token = os.environ.get('METRICS_TOKEN')
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
 
 # Health check
 @api_router.get("/")
@@ -337,13 +562,20 @@ async def root():
 # Include the router in the main app
 app.include_router(api_router)
 
+# Innermost, so shed requests still get CORS headers and show up in the metrics
+if os.environ.get('ADMISSION_CONTROL', 'on').lower() not in ('0', 'off', 'false'):
+    app.add_middleware(AdmissionMiddleware, gates=admission_gates)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+# Added last so it is outermost and its timings include CORS handling
+app.add_middleware(MetricsMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -352,6 +584,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_indexes():
+    # Индекс, который не удалось построить (например, дубликаты email), останавливает запуск;
+    # ALLOW_INDEX_FAILURES=1 — только залогировать и стартовать без него
+    await bootstrap_indexes(
+        db,
+        verify=os.environ.get('VERIFY_INDEXES', '').lower() in ('1', 'true'),
+        strict=os.environ.get('ALLOW_INDEX_FAILURES', '').lower() not in ('1', 'true'),
+    )
+    await ensure_catalog_stats(db)
+
+@app.on_event("startup")
+async def startup_search_index():
+    # Built in the background: the API starts serving at once, suggestions follow when the index is ready
+    app.state.search_build = search_service.schedule_rebuild(db)
+
+@app.on_event("startup")
+async def startup_pool_feed():
+    app.state.pool_feed = asyncio.create_task(pool_feed.run(db))
+
+@app.on_event("startup")
+async def startup_cart_sweeper():
+    if os.environ.get('CART_SWEEPER', 'on').lower() not in ('0', 'off', 'false'):
+        app.state.cart_sweeper = asyncio.create_task(run_cart_sweeper(db))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    if getattr(app.state, 'cart_sweeper', None):
+        app.state.cart_sweeper.cancel()
+    if getattr(app.state, 'pool_feed', None):
+        app.state.pool_feed.cancel()
+    client.close()
+    password_hasher.shutdown()
\ No newline at end of file
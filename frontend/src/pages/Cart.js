@@ -5,7 +5,6 @@ import { useAuth } from '../contexts/AuthContext';
 import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { Trash2, Plus, Minus, ShoppingBag } from 'lucide-react';
-import { allProducts } from '../mock/allProducts';
 import axios from 'axios';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -28,7 +27,9 @@ const Cart = () => {
 
   const fetchCart = async () => {
     try {
+      // expand=products: сервер возвращает товары и цены вместе с корзиной
       const response = await axios.get(`${API}/cart`, {
+        params: { expand: 'products' },
         headers: { Authorization: `Bearer ${token}` }
       });
       setCartItems(response.data.items || []);
@@ -60,7 +61,8 @@ const Cart = () => {
   };
 
   const getProductDetails = (productId) => {
-    return allProducts.find(p => p.id === productId);
+    const item = cartItems.find(i => i.product_id === productId);
+    return item ? item.product : null;
   };
 
   const calculateTotal = () => {
@@ -7,7 +7,6 @@ import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card'
 import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
 import { CreditCard, Smartphone, DollarSign, CheckCircle } from 'lucide-react';
-import { allProducts } from '../mock/allProducts';
 import axios from 'axios';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -19,6 +18,10 @@ const Checkout = () => {
   const navigate = useNavigate();
   const [cartItems, setCartItems] = useState([]);
   const [loading, setLoading] = useState(false);
+  // Один ключ на попытку оформления: повторная отправка не создаст второй заказ
+  const [idempotencyKey] = useState(() =>
+    window.crypto && window.crypto.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random()}`
+  );
   const [selectedPayment, setSelectedPayment] = useState('');
   const [shippingInfo, setShippingInfo] = useState({
     fullName: user?.name || '',
@@ -39,7 +42,9 @@ const Checkout = () => {
 
   const fetchCart = async () => {
     try {
+      // expand=products: сервер возвращает товары и цены вместе с корзиной
       const response = await axios.get(`${API}/cart`, {
+        params: { expand: 'products' },
         headers: { Authorization: `Bearer ${token}` }
       });
       setCartItems(response.data.items || []);
@@ -52,7 +57,8 @@ const Checkout = () => {
   };
 
   const getProductDetails = (productId) => {
-    return allProducts.find(p => p.id === productId);
+    const item = cartItems.find(i => i.product_id === productId);
+    return item ? item.product : null;
   };
 
   const calculateTotal = () => {
@@ -89,7 +95,7 @@ const Checkout = () => {
         `${API}/orders`, 
         orderData,
         {
-          headers: { Authorization: `Bearer ${token}` }
+          headers: { Authorization: `Bearer ${token}`, 'Idempotency-Key': idempotencyKey }
         }
       );
 
@@ -100,7 +106,7 @@ const Checkout = () => {
       navigate('/order-success', { 
         state: { 
           orderId: orderId, // ID из базы данных
-          total: calculateTotal(),
+          total: response.data.total_amount.toFixed(2), // Сумма, рассчитанная сервером
           paymentMethod: selectedPayment
         } 
       });
@@ -10,6 +10,10 @@ import axios from 'axios';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8000';
 const API = `${BACKEND_URL}/api`;
 
+// Только поля, которые показывает ProductCard (как на странице Products)
+const CARD_FIELDS = 'name,nameRw,image,category,regularPrice,perItemPrice,poolPrice,poolSize,poolCurrent,rating';
+const FEATURED_COUNT = 8;
+
 const Home = () => {
   const { language, t } = useLanguage();
   const [products, setProducts] = useState([]);
@@ -20,16 +24,16 @@ const Home = () => {
     const fetchProducts = async () => {
       setLoading(true);
       try {
-        // Загружаем все одобренные товары
-        const response = await axios.get(`${API}/seller/products/all`);
-        setProducts(response.data);
+        // Один запрос: первые товары для "Featured" и фасеты категорий по всему каталогу
+        const response = await axios.get(`${API}/catalog/products`, {
+          params: { limit: FEATURED_COUNT, fields: CARD_FIELDS },
+        });
+        setProducts(response.data.items);
 
-        // Динамически создаем список категорий
-        const uniqueCategories = [...new Set(response.data.map(p => p.category))];
         // TODO: В будущем здесь можно будет добавить перевод для категорий
-        const categoryObjects = uniqueCategories.map(name => ({
-          name: name,
-          nameRw: name, // Пока используем одинаковые имена
+        const categoryObjects = response.data.facets.categories.map(({ value }) => ({
+          name: value,
+          nameRw: value, // Пока используем одинаковые имена
           icon: ShoppingBag, // Иконка по умолчанию
         }));
         setCategories(categoryObjects);
@@ -44,9 +48,6 @@ const Home = () => {
     fetchProducts();
   }, []);
 
-  // Берем первые 8 товаров как "Featured"
-  const featuredProducts = products.slice(0, 8);
-
   return (
     <div className="bg-white">
       {/* Hero Section */}
@@ -59,7 +60,7 @@ const Home = () => {
           <p className="text-center text-gray-600 mb-8">{t.featuredProductsSubtitle}</p>
           {loading ? (
             <div className="text-center">Загрузка...</div>
-          ) : featuredProducts.length === 0 ? (
+          ) : products.length === 0 ? (
             <div className="text-center py-12">
               <p className="text-xl text-gray-500 mb-4">
                 {language === 'en' ? 'No products available yet' : language === 'rw' ? 'Nta bicuruzwa bihari' : 'Hakuna bidhaa bado'}
@@ -70,7 +71,7 @@ const Home = () => {
             </div>
           ) : (
             <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-6">
-              {featuredProducts.map((product) => (
+              {products.map((product) => (
                 <ProductCard key={product.id} product={product} />
               ))}
             </div>
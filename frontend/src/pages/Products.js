@@ -1,4 +1,4 @@
-import React, { useState, useMemo, useEffect } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useSearchParams } from 'react-router-dom';
 import { useLanguage } from '../contexts/LanguageContext';
 import ProductCard from '../components/ProductCard';
@@ -13,6 +13,9 @@ import axios from 'axios';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8000';
 const API = `${BACKEND_URL}/api`;
 
+// Только поля, которые показывает ProductCard (без описаний и галереи)
+const CARD_FIELDS = 'name,nameRw,image,category,regularPrice,perItemPrice,poolPrice,poolSize,poolCurrent,rating';
+
 const Products = () => {
   const { language, t } = useLanguage();
   const [searchParams] = useSearchParams();
@@ -26,19 +29,23 @@ const Products = () => {
   const searchQuery = searchParams.get('search') || '';
   const categoryFromUrl = searchParams.get('category') || '';
 
-  // Загрузка товаров из базы данных
+  const categoryFilter = categoryFromUrl || selectedCategory;
+
+  // Фильтрация, сортировка и подсчёт категорий выполняются на сервере (/catalog/products)
   useEffect(() => {
     const fetchProducts = async () => {
       setLoading(true);
       try {
-        // ИЗМЕНЕНИЕ: Запрашиваем правильный URL
-        const response = await axios.get(`${API}/seller/products/all`);
-        setProducts(response.data);
-
-        // ИЗМЕНЕНИЕ: Автоматически создаем список категорий из полученных товаров
-        const uniqueCategories = [...new Set(response.data.map(p => p.category))];
-        setCategories(uniqueCategories);
-
+        const response = await axios.get(`${API}/catalog/products`, {
+          params: {
+            search: searchQuery || undefined,
+            category: categoryFilter !== 'all' ? categoryFilter : undefined,
+            price_band: priceRange !== 'all' ? priceRange : undefined,
+            fields: CARD_FIELDS,
+          },
+        });
+        setProducts(response.data.items);
+        setCategories(response.data.facets.categories.map(c => c.value));
       } catch (err) {
         setError('Ошибка при загрузке товаров');
         console.error(err); // Добавим лог для отладки
@@ -48,38 +55,9 @@ const Products = () => {
     };
 
     fetchProducts();
-  }, []); // Пустой массив зависимостей, чтобы загрузка происходила 1 раз
-
-  const filteredProducts = useMemo(() => {
-    let filtered = [...products];
-
-    // Фильтр по запросу поиска
-    if (searchQuery) {
-      filtered = filtered.filter(p =>
-        p.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-        p.nameRw.toLowerCase().includes(searchQuery.toLowerCase())
-      );
-    }
-
-    // Фильтр по категории
-    const categoryFilter = categoryFromUrl || selectedCategory;
-    if (categoryFilter && categoryFilter !== 'all') {
-      filtered = filtered.filter(p => p.category === categoryFilter);
-    }
-
-    // Фильтр по ценовому диапазону
-    if (priceRange === 'under50') {
-      filtered = filtered.filter(p => p.poolPrice < 50);
-    } else if (priceRange === '50to100') {
-      filtered = filtered.filter(p => p.poolPrice >= 50 && p.poolPrice <= 100);
-    } else if (priceRange === 'over100') {
-      filtered = filtered.filter(p => p.poolPrice > 100);
-    }
-
-    return filtered;
-  }, [searchQuery, selectedCategory, categoryFromUrl, priceRange, products]);
+  }, [searchQuery, categoryFilter, priceRange]);
 
-  if (loading) return <div className="container mx-auto px-4 py-8">Загрузка...</div>;
+  if (loading && products.length === 0) return <div className="container mx-auto px-4 py-8">Загрузка...</div>;
   if (error) return <div className="container mx-auto px-4 py-8 text-red-600">{error}</div>;
 
   return (
@@ -192,9 +170,9 @@ const Products = () => {
 
           {/* Products Grid */}
           <div className="flex-1">
-            {filteredProducts.length > 0 ? (
+            {products.length > 0 ? (
               <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6">
-                {filteredProducts.map((product) => (
+                {products.map((product) => (
                   <ProductCard key={product.id} product={product} />
                 ))}
               </div>
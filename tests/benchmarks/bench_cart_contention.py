@@ -0,0 +1,105 @@
+"""
+Cart contention stress test: concurrent "add to cart" calls on one cart.
+
+Fires BENCH_CART_REQUESTS concurrent carts.apply_cart_deltas() calls against a single
+user's cart, spread over BENCH_CART_PRODUCTS products, so many of them race to add a
+product that isn't in the cart yet (the "two tabs" case). Checks that every product's
+final quantity equals the sum of the quantities added and that no product appears twice.
+
+For comparison the same workload runs through the previous write list (a positional
+$inc, a guarded $push and a $pull). It is applied statement by statement, the way Mongo
+executes an ordered bulk_write. Each of those statements is atomic, but the list is not,
+so concurrent adds of a new product lose quantities.
+
+mongomock runs a whole bulk_write as one synchronous call, so the race only shows up
+against a real server or when the statements are issued separately, as done here. Set
+BENCH_MONGO_URL to check the pipeline update against a local mongod.
+
+Run from the repository root:
+    python -m tests.benchmarks.bench_cart_contention
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+
+from tests.benchmarks.standin import connect
+
+from carts import apply_cart_deltas  # noqa: E402
+from models import CartItemDelta  # noqa: E402
+
+
+REQUESTS = int(os.environ.get("BENCH_CART_REQUESTS", 500))
+PRODUCTS = int(os.environ.get("BENCH_CART_PRODUCTS", 20))
+
+
+async def statement_by_statement(db, user_id: str, deltas):
+    # The pre-fix cart_delta_operations(), one statement per round trip
+    await db.carts.update_one({"user_id": user_id}, {"$setOnInsert": {"items": []}}, upsert=True)
+    for delta in deltas:
+        match = {"product_id": delta.product_id, "is_pool_purchase": delta.is_pool_purchase}
+        await db.carts.update_one(
+            {"user_id": user_id, "items": {"$elemMatch": match}},
+            {"$inc": {"items.$.quantity": delta.quantity}},
+        )
+        if delta.quantity > 0:
+            await db.carts.update_one(
+                {"user_id": user_id, "items": {"$not": {"$elemMatch": match}}},
+                {"$push": {"items": delta.dict()}},
+            )
+    await db.carts.update_one({"user_id": user_id}, {"$pull": {"items": {"quantity": {"$lte": 0}}}})
+
+
+async def run(db, apply, deltas):
+    user_id = str(uuid.uuid4())
+    # The cart exists up front (as carts.user_id_unique guarantees one per user), so only the item race is measured
+    await db.carts.insert_one({"user_id": user_id, "items": []})
+    started = time.perf_counter()
+    await asyncio.gather(*[apply(db, user_id, [delta]) for delta in deltas])
+    elapsed = time.perf_counter() - started
+
+    cart = await db.carts.find_one({"user_id": user_id})
+    expected = Counter()
+    for delta in deltas:
+        expected[delta.product_id] += delta.quantity
+    actual = Counter()
+    for item in cart["items"]:
+        actual[item["product_id"]] += item["quantity"]
+    return {
+        "requests": len(deltas),
+        "expected_units": sum(expected.values()),
+        "cart_units": sum(actual.values()),
+        "lost_units": sum(expected.values()) - sum(actual.values()),
+        "wrong_products": sum(1 for product_id in expected if expected[product_id] != actual[product_id]),
+        "duplicate_lines": len(cart["items"]) - len({item["product_id"] for item in cart["items"]}),
+        "requests_per_second": len(deltas) / elapsed,
+    }
+
+
+async def main():
+    db, client = connect()
+    rng = random.Random(42)
+    products = [str(uuid.uuid4()) for _ in range(PRODUCTS)]
+    deltas = [CartItemDelta(product_id=rng.choice(products), quantity=rng.randint(1, 3)) for _ in range(REQUESTS)]
+    try:
+        pipeline = await run(db, apply_cart_deltas, deltas)
+        separate = await run(db, statement_by_statement, deltas)
+    finally:
+        client.close()
+
+    if not os.environ.get("BENCH_MONGO_URL"):
+        print("note: in-memory stand-in; set BENCH_MONGO_URL to check the pipeline update against mongod")
+    for name, result in (("pipeline", pipeline), ("separate", separate)):
+        print(f"{name:>8}: " + ", ".join(f"{key}={value:.0f}" if isinstance(value, float) else f"{key}={value}"
+                                          for key, value in result.items()))
+
+    ok = pipeline["lost_units"] == 0 and pipeline["wrong_products"] == 0 and pipeline["duplicate_lines"] == 0
+    print("pipeline update:", "PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,271 @@
+"""
+Endpoint load test: boots server.app in-process against a seeded database and drives a
+mixed workload through the real routes (auth, dependencies, caches, serialization).
+
+Workload mix (weights in WORKLOAD): catalog browse, product detail, login, cart add/remove,
+checkout and admin moderation. BENCH_CONCURRENCY virtual users run for BENCH_DURATION
+seconds, picking an action per iteration. Per endpoint (route template) it reports
+p50/p95/p99 latency, requests per second and status codes, and writes everything to a
+JSON file so runs can be compared between commits (BENCH_BASELINE=<older json>).
+
+mongomock runs queries in pure Python on the event loop, so against the stand-in the
+absolute numbers mostly measure mongomock (aggregations and sorted scans dominate); use
+them only to compare commits on the same machine. Point BENCH_MONGO_URL at a local
+mongod for representative latencies.
+
+Configuration (environment):
+    BENCH_PRODUCTS=1000 BENCH_USERS=200 BENCH_SELLERS=20 BENCH_ADMINS=3 BENCH_CARTS=100 BENCH_ORDERS=0
+    BENCH_CONCURRENCY=20 BENCH_DURATION=15 BENCH_SEED=42
+    BENCH_OUTPUT=tests/benchmarks/results/endpoints-<commit>.json
+    BENCH_MONGO_URL / BENCH_LATENCY_MS (see standin.py)
+
+Run from the repository root:
+    python -m tests.benchmarks.bench_endpoints
+"""
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# server.py reads these at import time; the real connection is swapped out below
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "kivu_bench")
+
+from tests.benchmarks.standin import connect  # noqa: E402
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from auth import create_user_access_token, get_password_hash  # noqa: E402
+from datagen import CATEGORIES, EMAIL_DOMAIN, DatasetGenerator, DatasetSpec, write_dataset  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+
+PRODUCTS = int(os.environ.get("BENCH_PRODUCTS", 1000))
+USERS = int(os.environ.get("BENCH_USERS", 200))
+SELLERS = int(os.environ.get("BENCH_SELLERS", 20))
+ADMINS = int(os.environ.get("BENCH_ADMINS", 3))
+CARTS = int(os.environ.get("BENCH_CARTS", 100))
+ORDERS = int(os.environ.get("BENCH_ORDERS", 0))
+CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", 20))
+DURATION = float(os.environ.get("BENCH_DURATION", 15))
+SEED = int(os.environ.get("BENCH_SEED", 42))
+
+PASSWORD = "bench-password"
+SORTS = ["newest", "price_asc", "price_desc", "rating", "popular"]
+CARD_FIELDS = "name,nameRw,image,category,regularPrice,perItemPrice,poolPrice,poolSize,poolCurrent,rating"
+
+# Relative weight of each user action
+WORKLOAD = {
+    "browse": 45,
+    "detail": 15,
+    "login": 5,
+    "cart": 20,
+    "checkout": 10,
+    "moderation": 5,
+}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed(db) -> dict:
+    """Write the datagen dataset for BENCH_SEED; returns the ids the workload needs."""
+    spec = DatasetSpec(seed=SEED, buyers=USERS, sellers=SELLERS, admins=ADMINS, products=PRODUCTS, carts=CARTS, orders=ORDERS)
+    generator = DatasetGenerator(spec, get_password_hash(PASSWORD))  # One bcrypt call; every bench user shares it
+    await write_dataset(db, generator)
+    # Newest first, so product_id()'s skew concentrates traffic on recent listings
+    approved = await db.seller_products.find({"status": "approved"}, {"_id": 0, "id": 1}).sort("created_at", 1).to_list(length=None)
+    return {
+        "buyers": [(generator.user_id("buyer", i), f"buyer{i}@{EMAIL_DOMAIN}") for i in range(USERS)],
+        "admins": [generator.user_id("admin", i) for i in range(ADMINS)],
+        "approved": [product["id"] for product in approved],
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, http: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except Exception as e:  # An unhandled server error surfaces here through the ASGI transport
+            response, status = None, type(e).__name__
+        self.latencies[name].append(time.perf_counter() - started)
+        self.statuses[name][status] += 1
+        return response
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for name, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        statuses = dict(recorder.statuses[name])
+        endpoints[name] = {
+            "requests": len(values),
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3),
+            "errors": sum(count for status, count in statuses.items() if not status.isdigit() or status >= "500"),
+            "statuses": statuses,
+        }
+    return endpoints
+
+
+class VirtualUser:
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder, data: dict, rng: random.Random):
+        self.http = http
+        self.recorder = recorder
+        self.data = data
+        self.rng = rng
+        buyer_id, self.email = rng.choice(data["buyers"])
+        self.headers = {"Authorization": f"Bearer {create_user_access_token(buyer_id, 'buyer', 0)}"}
+        admin_id = rng.choice(data["admins"])
+        self.admin_headers = {"Authorization": f"Bearer {create_user_access_token(admin_id, 'admin', 0)}"}
+
+    def product_id(self) -> str:
+        # Skewed towards the newest products, the way real traffic concentrates on a few listings
+        approved = self.data["approved"]
+        return approved[-1 - min(int(self.rng.expovariate(1 / 50)), len(approved) - 1)]
+
+    async def browse(self):
+        params = {"sort": self.rng.choice(SORTS), "skip": self.rng.choice([0, 0, 0, 20, 40]), "limit": 20, "fields": CARD_FIELDS}
+        if self.rng.random() < 0.5:
+            params["category"] = self.rng.choice(list(CATEGORIES))
+        await self.recorder.request(self.http, "GET /api/catalog/products", "GET", "/api/catalog/products", params=params)
+        if self.rng.random() < 0.3:
+            await self.recorder.request(self.http, "GET /api/seller/products/all", "GET", "/api/seller/products/all", params={"limit": 20})
+
+    async def detail(self):
+        await self.recorder.request(self.http, "GET /api/products/{product_id}", "GET", f"/api/products/{self.product_id()}")
+
+    async def login(self):
+        await self.recorder.request(self.http, "POST /api/auth/login", "POST", "/api/auth/login",
+                                    json={"email": self.email, "password": PASSWORD})
+
+    async def cart(self):
+        product_id = self.product_id()
+        item = {"product_id": product_id, "quantity": self.rng.randint(1, 3), "is_pool_purchase": self.rng.random() < 0.5}
+        await self.recorder.request(self.http, "POST /api/cart/add", "POST", "/api/cart/add", json=item, headers=self.headers)
+        await self.recorder.request(self.http, "GET /api/cart", "GET", "/api/cart", params={"expand": "products"}, headers=self.headers)
+        await self.recorder.request(self.http, "DELETE /api/cart/remove/{product_id}", "DELETE", f"/api/cart/remove/{product_id}",
+                                    params={"is_pool_purchase": item["is_pool_purchase"]}, headers=self.headers)
+
+    async def checkout(self):
+        items = [
+            {"product_id": self.product_id(), "quantity": self.rng.randint(1, 2), "is_pool_purchase": self.rng.random() < 0.3}
+            for _ in range(self.rng.randint(1, 3))
+        ]
+        for item in items:
+            await self.recorder.request(self.http, "POST /api/cart/add", "POST", "/api/cart/add", json=item, headers=self.headers)
+        await self.recorder.request(self.http, "POST /api/orders", "POST", "/api/orders", json={"items": items},
+                                    headers={**self.headers, "Idempotency-Key": str(uuid.uuid4())})
+
+    async def moderation(self):
+        response = await self.recorder.request(self.http, "POST /api/admin/moderation/claim", "POST", "/api/admin/moderation/claim",
+                                               params={"batch": 5}, headers=self.admin_headers)
+        claimed = [product["id"] for product in response.json()] if response is not None and response.status_code == 200 else []
+        if claimed:
+            await self.recorder.request(self.http, "POST /api/admin/products/bulk-moderate", "POST", "/api/admin/products/bulk-moderate",
+                                        json={"action": self.rng.choice(["approve", "reject"]), "ids": claimed}, headers=self.admin_headers)
+        await self.recorder.request(self.http, "GET /api/admin/products/pending", "GET", "/api/admin/products/pending",
+                                    params={"limit": 50}, headers=self.admin_headers)
+
+    async def run(self, deadline: float):
+        actions = list(WORKLOAD)
+        weights = [WORKLOAD[action] for action in actions]
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(actions, weights)[0])()
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\nvs baseline {baseline.get('commit')} ({baseline.get('started_at')}):")
+    for name, stats in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        deltas = [f"{key} {(stats[key] - before[key]) / before[key]:+.0%}" for key in ("p50_ms", "p99_ms", "rps") if before[key]]
+        print(f"  {name:<42} " + ", ".join(deltas))
+
+
+async def main():
+    db, client = connect()
+    server.db, server.client = db, client
+    try:
+        await ensure_indexes(db)
+        seed_started = time.perf_counter()
+        data = await seed(db)
+        seed_seconds = time.perf_counter() - seed_started
+
+        recorder = Recorder()
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            users = [VirtualUser(http, recorder, data, random.Random(SEED + i)) for i in range(CONCURRENCY)]
+            started = time.perf_counter()
+            deadline = started + DURATION
+            await asyncio.gather(*[user.run(deadline) for user in users])
+            elapsed = time.perf_counter() - started
+    finally:
+        client.close()
+        server.password_hasher.shutdown()
+
+    endpoints = summarize(recorder, elapsed)
+    result = {
+        "commit": git_commit(),
+        "started_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "database": "mongodb" if os.environ.get("BENCH_MONGO_URL") else f"standin ({os.environ.get('BENCH_LATENCY_MS', 2)}ms latency)",
+        "config": {
+            "products": PRODUCTS, "users": USERS, "sellers": SELLERS, "admins": ADMINS, "carts": CARTS, "orders": ORDERS,
+            "concurrency": CONCURRENCY, "duration_s": DURATION, "seed": SEED, "workload": WORKLOAD,
+        },
+        "seed_seconds": round(seed_seconds, 2),
+        "elapsed_s": round(elapsed, 2),
+        "total_requests": sum(stats["requests"] for stats in endpoints.values()),
+        "total_rps": round(sum(stats["requests"] for stats in endpoints.values()) / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+    print(f"{'endpoint':<44}{'req':>7}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err':>6}")
+    for name, stats in endpoints.items():
+        print(f"{name:<44}{stats['requests']:>7}{stats['rps']:>9.1f}{stats['p50_ms']:>9.2f}"
+              f"{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['errors']:>6}")
+    print(f"total: {result['total_requests']} requests, {result['total_rps']:.1f} rps over {result['elapsed_s']}s")
+
+    output = Path(os.environ.get("BENCH_OUTPUT") or Path(__file__).parent / "results" / f"endpoints-{result['commit'] or 'local'}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"saved {output}")
+
+    baseline = os.environ.get("BENCH_BASELINE")
+    if baseline:
+        compare(result, json.loads(Path(baseline).read_text()))
+    return 1 if any(stats["errors"] for stats in endpoints.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,106 @@
+"""
+Pool contention stress test: many concurrent pool purchases on one product.
+
+Drives pools.reserve_pool_slots() with BENCH_POOL_REQUESTS concurrent reservations
+(1-3 slots each) against a pool of BENCH_POOL_SIZE slots and checks that:
+  - poolCurrent never exceeds poolSize (no oversell),
+  - poolCurrent equals the sum of the successful reservations (no lost increments),
+  - the pool is closed exactly when it fills, by exactly one reservation;
+  - with some orders giving their slots back (an order insert that failed) while
+    others fill the pool, poolStatus still matches poolCurrent at the end.
+
+A naive read-then-write implementation is run on the same workload for comparison.
+
+Run from the repository root (set BENCH_MONGO_URL to use a local mongod):
+    python -m tests.benchmarks.bench_pool_contention
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+from tests.benchmarks.standin import connect
+
+from pools import reserve_pool_slots, release_pool_slots  # noqa: E402
+
+
+POOL_SIZE = int(os.environ.get("BENCH_POOL_SIZE", 500))
+REQUESTS = int(os.environ.get("BENCH_POOL_REQUESTS", 2000))
+
+
+async def naive_reserve(db, product_id: str, quantity: int):
+    # Read, check in Python, write back: the pattern the pool engine replaces
+    product = await db.seller_products.find_one({"id": product_id})
+    if product["poolCurrent"] + quantity > product["poolSize"]:
+        return None
+    await db.seller_products.update_one({"id": product_id}, {"$set": {"poolCurrent": product["poolCurrent"] + quantity}})
+    return product
+
+
+async def run(db, reserve, quantities):
+    product_id = str(uuid.uuid4())
+    await db.seller_products.insert_one({
+        "id": product_id, "status": "approved", "poolSize": POOL_SIZE, "poolCurrent": 0, "poolStatus": "open",
+    })
+    started = time.perf_counter()
+    results = await asyncio.gather(*[reserve(db, product_id, quantity) for quantity in quantities])
+    elapsed = time.perf_counter() - started
+
+    product = await db.seller_products.find_one({"id": product_id})
+    granted = sum(quantity for quantity, result in zip(quantities, results) if result is not None)
+    return {
+        "requests": len(quantities),
+        "granted_slots": granted,
+        "pool_current": product["poolCurrent"],
+        "pool_size": product["poolSize"],
+        "oversold": max(granted - product["poolSize"], 0),
+        "lost_updates": granted - product["poolCurrent"],
+        "closed": product.get("poolStatus") == "closed",
+        # Reservations that saw the pool fill (only the engine reports this)
+        "closers": sum(1 for result in results if result and result.get("poolStatus") == "closed"),
+        "requests_per_second": len(quantities) / elapsed,
+    }
+
+
+async def reserve_then_release(db, product_id: str, quantity: int):
+    # Every third successful order fails after reserving and releases its slots
+    pool = await reserve_pool_slots(db, product_id, quantity)
+    if pool is not None and quantity == 3:
+        await release_pool_slots(db, product_id, quantity)
+        return None
+    return pool
+
+
+async def main():
+    db, client = connect()
+    rng = random.Random(42)
+    quantities = [rng.randint(1, 3) for _ in range(REQUESTS)]
+    try:
+        atomic = await run(db, reserve_pool_slots, quantities)
+        naive = await run(db, naive_reserve, quantities)
+        mixed = await run(db, reserve_then_release, quantities)
+    finally:
+        client.close()
+
+    for name, result in (("atomic", atomic), ("naive", naive), ("mixed", mixed)):
+        print(f"{name:>7}: " + ", ".join(f"{key}={value:.0f}" if isinstance(value, float) else f"{key}={value}"
+                                         for key, value in result.items()))
+
+    ok = (
+        atomic["oversold"] == 0
+        and atomic["lost_updates"] == 0
+        and atomic["pool_current"] <= atomic["pool_size"]
+        and atomic["closed"] == (atomic["pool_current"] == atomic["pool_size"])
+        and atomic["closers"] == (1 if atomic["closed"] else 0)
+        and mixed["oversold"] == 0
+        and mixed["lost_updates"] == 0
+        and mixed["closed"] == (mixed["pool_current"] == mixed["pool_size"])
+    )
+    print("atomic engine:", "PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark: current list serialization path vs the trusted-read path.
+
+Current path (what FastAPI does for response_model=List[SellerProduct]):
+build SellerProduct(**doc) per document, dump the models back to dicts, validate
+them again against the response model, serialize to JSON-able data, json.dumps.
+Trusted path: encode the projected Mongo documents straight to bytes.
+
+Run from the repository root:
+    python -m tests.benchmarks.bench_serialization
+"""
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from models import SellerProduct  # noqa: E402
+from serialization import dumps  # noqa: E402
+
+
+PAGE_SIZES = (20, 50, 500)
+
+
+def make_documents(count: int) -> List[dict]:
+    base = datetime(2025, 1, 1)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "seller_id": str(uuid.uuid4()),
+            "name": f"Wireless Headphones {i}",
+            "nameRw": f"Amatwi Adafite Insinga {i}",
+            "description": "High-quality wireless headphones with noise cancellation",
+            "descriptionRw": "Amatwi yujuje ubuziranenge adafite insinga hamwe no guhagarika urusaku",
+            "category": "Electronics",
+            "image": "https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=500",
+            "images": [],
+            "regularPrice": 89.99,
+            "perItemPrice": 89.99,
+            "poolPrice": 64.99,
+            "poolSize": 100,
+            "poolCurrent": i % 100,
+            "poolStatus": "open",
+            "rating": 4.5,
+            "status": "approved",
+            "created_at": base + timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+adapter = TypeAdapter(List[SellerProduct])
+
+
+def current_path(docs: List[dict]) -> bytes:
+    content = [SellerProduct(**doc) for doc in docs]
+    prepared = [model.model_dump(by_alias=True) for model in content]
+    validated = adapter.validate_python(prepared)
+    jsonable = adapter.dump_python(validated, mode="json")
+    return json.dumps(jsonable, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def trusted_path(docs: List[dict]) -> bytes:
+    return dumps(docs)
+
+
+def measure(func, docs: List[dict], min_seconds: float = 0.5) -> float:
+    """Mean seconds per call, repeating until at least min_seconds have elapsed."""
+    func(docs)  # warm-up
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        func(docs)
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+def main():
+    print(f"{'items':>6} {'current (ms)':>14} {'trusted (ms)':>14} {'speedup':>9}")
+    for size in PAGE_SIZES:
+        docs = make_documents(size)
+        assert json.loads(current_path(docs)) == json.loads(trusted_path(docs))
+        current = measure(current_path, docs)
+        trusted = measure(trusted_path, docs)
+        print(f"{size:>6} {current * 1000:>14.3f} {trusted * 1000:>14.3f} {current / trusted:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Database used by the benchmark scripts.
+
+With BENCH_MONGO_URL set, the scripts run against that (local) MongoDB. Otherwise they
+use mongomock-motor, an in-memory Motor-compatible stand-in. mongomock executes every
+operation synchronously, so the stand-in is wrapped in LatencyDatabase, which yields to
+the event loop for BENCH_LATENCY_MS around each call the way a network round trip
+would. Without that, concurrent requests would never interleave and races could not
+show up.
+"""
+import asyncio
+import os
+import random
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+class _LatencyCursor:
+    def __init__(self, cursor, delay):
+        self._cursor = cursor
+        self._delay = delay
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name == "to_list":
+            async def to_list(*args, **kwargs):
+                await self._delay()
+                return await attr(*args, **kwargs)
+            return to_list
+        if callable(attr):
+            def chained(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                return self if result is self._cursor else result
+            return chained
+        return attr
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._delay()
+        async for doc in self._cursor:
+            yield doc
+
+
+class _LatencyCollection:
+    CURSOR_METHODS = {"find", "aggregate"}
+
+    def __init__(self, collection, delay):
+        self._collection = collection
+        self._delay = delay
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in self.CURSOR_METHODS:
+            return lambda *args, **kwargs: _LatencyCursor(attr(*args, **kwargs), self._delay)
+        if asyncio.iscoroutinefunction(attr):
+            async def call(*args, **kwargs):
+                await self._delay()
+                result = await attr(*args, **kwargs)
+                await self._delay()
+                return result
+            return call
+        return attr
+
+
+class LatencyDatabase:
+    def __init__(self, db, latency_ms: float):
+        self._db = db
+        self._latency = latency_ms / 1000.0
+
+    async def _delay(self):
+        # Half the round trip before the server applies the operation, half after
+        await asyncio.sleep(random.uniform(0, self._latency))
+
+    def __getattr__(self, name):
+        return _LatencyCollection(getattr(self._db, name), self._delay)
+
+    def __getitem__(self, name):
+        return _LatencyCollection(self._db[name], self._delay)
+
+
+def connect(db_name: str = "kivu_bench"):
+    """Return (db, client) for BENCH_MONGO_URL, or the in-memory stand-in."""
+    mongo_url = os.environ.get("BENCH_MONGO_URL")
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongo_url)
+        return client[db_name], client
+
+    from mongomock_motor import AsyncMongoMockClient
+    client = AsyncMongoMockClient()
+    latency_ms = float(os.environ.get("BENCH_LATENCY_MS", 2))
+    return LatencyDatabase(client[db_name], latency_ms), client
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The backend modules import each other flat (as server.py runs them), so tests do too
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
@@ -0,0 +1,98 @@
+"""
+Keyset pagination over created_at values of both BSON types. Legacy documents store
+created_at as a float (see migrations.NormalizeCreatedAt), and Mongo sorts numbers
+before dates, so a cursor can hold either type.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+from pagination import KEYSET_SORT, decode_cursor, encode_cursor, fetch_page, keyset_query
+
+
+def mixed_documents():
+    start = datetime(2025, 1, 1)
+    dates = [{"id": f"d{i:02d}", "created_at": start + timedelta(hours=i // 2)} for i in range(9)]
+    floats = [{"id": f"f{i:02d}", "created_at": float(1000 + i // 2)} for i in range(8)]
+    return dates + floats
+
+
+async def seeded_collection(docs):
+    collection = AsyncMongoMockClient()["kivu"]["seller_products"]
+    await collection.insert_many([dict(doc) for doc in docs])
+    return collection
+
+
+async def all_pages(collection, limit):
+    ids, cursor = [], None
+    while True:
+        docs, cursor = await fetch_page(collection, {}, cursor=cursor, limit=limit, projection={"_id": 0})
+        ids += [doc["id"] for doc in docs]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 20])
+def test_fetch_page_newest_first_crosses_from_dates_to_floats(limit):
+    async def run():
+        collection = await seeded_collection(mixed_documents())
+        expected = [doc["id"] async for doc in collection.find({}).sort(KEYSET_SORT)]
+        return expected, await all_pages(collection, limit)
+
+    expected, paged = asyncio.run(run())
+    assert len(paged) == len(set(paged)) == len(mixed_documents())
+    assert paged == expected
+    # Dates sort after numbers, so newest-first lists every date before any float
+    assert paged[:9] == sorted(paged[:9], reverse=True) and all(id.startswith("d") for id in paged[:9])
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4])
+def test_keyset_query_oldest_first_crosses_from_floats_to_dates(limit):
+    sort = [(field, 1) for field, _ in KEYSET_SORT]
+
+    async def run():
+        collection = await seeded_collection(mixed_documents())
+        expected = [doc["id"] async for doc in collection.find({}).sort(sort)]
+        paged, cursor = [], None
+        while True:
+            docs = await collection.find(keyset_query({}, cursor, ascending=True), {"_id": 0}).sort(sort).limit(limit).to_list(length=limit)
+            if not docs:
+                return expected, paged
+            paged += [doc["id"] for doc in docs]
+            cursor = encode_cursor(docs[-1])
+
+    expected, paged = asyncio.run(run())
+    assert paged == expected
+    assert len(paged) == len(set(paged)) == len(mixed_documents())
+
+
+def test_keyset_query_keeps_the_base_filter():
+    async def run():
+        docs = mixed_documents()
+        for index, doc in enumerate(docs):
+            doc["status"] = "approved" if index % 2 else "pending"
+        collection = await seeded_collection(docs)
+        ids, cursor = [], None
+        while True:
+            page, cursor = await fetch_page(collection, {"status": "approved"}, cursor=cursor, limit=2, projection={"_id": 0})
+            ids += [doc["id"] for doc in page]
+            if cursor is None:
+                return docs, ids
+
+    docs, ids = asyncio.run(run())
+    assert sorted(ids) == sorted(doc["id"] for doc in docs if doc["status"] == "approved")
+    assert len(ids) == len(set(ids))
+
+
+@pytest.mark.parametrize("created_at", [datetime(2025, 3, 4, 5, 6, 7, 123000), 1234.5])
+def test_cursor_round_trip_keeps_the_value_type(created_at):
+    assert decode_cursor(encode_cursor({"id": "p1", "created_at": created_at})) == (created_at, "p1")
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        keyset_query({}, "not-a-cursor")
+    assert error.value.status_code == 400